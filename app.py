@@ -1,4 +1,5 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
 import numpy as np
 import pandas as pd
 import matplotlib
@@ -7,19 +8,256 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 #from scipy import stats
 import base64
+import cProfile
+import functools
 import io
 import json
+import os
+import pstats
+import random
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
+# Proxies delante de la aplicación (el router de Heroku es uno): la IP del cliente se toma
+# de la entrada de X-Forwarded-For que agregó el último proxy confiable, no de la primera
+proxies_confiables = int(os.environ.get('PROXIES_CONFIABLES', 1))
+if proxies_confiables > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies_confiables)
+
+# pyplot usa una figura actual global: con varios hilos por worker, las gráficas se dibujan de a una
+candado_pyplot = threading.Lock()
+
+# Una clase "min-max"; ambos límites pueden ser negativos (ej: "-10--5")
+PATRON_CLASE = re.compile(r'^\s*(-?[\d.]+(?:[eE][-+]?\d+)?)\s*-\s*(-?[\d.]+(?:[eE][-+]?\d+)?)\s*$')
+
+def limites_clase(clase):
+    """Devuelve (inferior, superior) de una clase "min-max", o None si no tiene ese formato"""
+    coincidencia = PATRON_CLASE.match(clase)
+    if coincidencia is None:
+        return None
+    return float(coincidencia.group(1)), float(coincidencia.group(2))
+
+def formatear_clase(inferior, superior):
+    """Inverso de limites_clase"""
+    return f"{round(float(inferior), 4)}-{round(float(superior), 4)}"
+
+class MotorClases:
+    """Convierte datos desagrupados en clases (intervalos) y frecuencias.
+
+    Las estrategias se calculan a partir de un resumen (n, mínimo, máximo, cuartiles y
+    desviación) que se obtiene una sola vez por conjunto de datos. Tanto el resumen como
+    cada agrupación se guardan en caché por el hash del contenido de los datos.
+    """
+
+    ESTRATEGIAS = ('auto', 'sturges', 'freedman_diaconis', 'scott', 'ancho_fijo', 'cuantiles')
+    MAX_CLASES = 1000
+
+    def __init__(self, cuantil_ponderado, max_entradas=64):
+        self.cuantil_ponderado = cuantil_ponderado
+        self.max_entradas = max_entradas
+        self._cache = OrderedDict()
+        self._candado = threading.Lock()
+
+    def _huella(self, datos, conteos):
+        huella = hashlib.sha1(datos.tobytes())
+        if conteos is not None:
+            huella.update(conteos.tobytes())
+        return huella.hexdigest()
+
+    def _desde_cache(self, clave, calcular):
+        with self._candado:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                return self._cache[clave]
+        valor = calcular()
+        with self._candado:
+            self._cache[clave] = valor
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+        return valor
+
+    def resumir(self, datos, conteos=None):
+        """Resumen usado por las estrategias; con conteos, datos son valores únicos ordenados"""
+        datos = np.asarray(datos, dtype=float)
+        if conteos is not None:
+            conteos = np.asarray(conteos, dtype=np.int64)
+
+        def calcular():
+            if conteos is None:
+                n = len(datos)
+                q1, q3 = np.percentile(datos, [25, 75])
+                desviacion = float(np.std(datos))
+            else:
+                n = int(np.sum(conteos))
+                q1, q3 = self.cuantil_ponderado(datos, conteos, [0.25, 0.75])
+                media = np.sum(datos * conteos) / n
+                desviacion = float(np.sqrt(np.sum(conteos * (datos - media)**2) / n))
+            return {
+                'n': n,
+                'minimo': float(np.min(datos)),
+                'maximo': float(np.max(datos)),
+                'q1': float(q1),
+                'q3': float(q3),
+                'desviacion': desviacion
+            }
+
+        return self._desde_cache(('resumen', self._huella(datos, conteos)), calcular)
+
+    def calcular_bordes(self, resumen, estrategia='auto', num_clases=None, ancho=None,
+                        datos=None, conteos=None, max_clases=None):
+        """Calcula los bordes de las clases; 'cuantiles' necesita además los datos"""
+        if estrategia not in self.ESTRATEGIAS:
+            raise ValueError(f'Estrategia de agrupación desconocida: {estrategia}')
+        max_clases = max_clases or self.MAX_CLASES
+        n, minimo, maximo = resumen['n'], resumen['minimo'], resumen['maximo']
+        rango = maximo - minimo
+        if rango == 0:
+            return np.array([minimo - 0.5, maximo + 0.5])
+
+        if estrategia == 'cuantiles':
+            k = min(int(num_clases or np.ceil(np.log2(n)) + 1), max_clases)
+            probabilidades = np.linspace(0, 1, k + 1)
+            if conteos is None:
+                bordes = np.quantile(datos, probabilidades)
+            else:
+                bordes = self.cuantil_ponderado(datos, conteos, probabilidades)
+            return np.unique(bordes)
+
+        if estrategia == 'ancho_fijo':
+            if not ancho or ancho <= 0:
+                raise ValueError('La estrategia ancho_fijo requiere un ancho positivo')
+            k = int(np.ceil(rango / ancho)) or 1
+            if k > max_clases:
+                raise ValueError(f'El ancho {ancho} produce más de {max_clases} clases')
+            return minimo + ancho * np.arange(k + 1)
+
+        # Estrategias de ancho igual: número de clases según la regla
+        sturges = np.ceil(np.log2(n)) + 1
+        ancho_fd = 2 * (resumen['q3'] - resumen['q1']) / np.cbrt(n)
+        ancho_scott = 3.49 * resumen['desviacion'] / np.cbrt(n)
+        if num_clases:
+            k = num_clases
+        elif estrategia == 'sturges':
+            k = sturges
+        elif estrategia == 'freedman_diaconis':
+            k = np.ceil(rango / ancho_fd) if ancho_fd > 0 else sturges
+        elif estrategia == 'scott':
+            k = np.ceil(rango / ancho_scott) if ancho_scott > 0 else sturges
+        else:
+            # Igual que bins='auto' de NumPy: la mayor cantidad entre Sturges y Freedman-Diaconis
+            k = max(sturges, np.ceil(rango / ancho_fd)) if ancho_fd > 0 else sturges
+        k = int(min(max(k, 1), max_clases))
+        return np.linspace(minimo, maximo, k + 1)
+
+    def agrupar(self, datos, conteos=None, estrategia='auto', num_clases=None, ancho=None, max_clases=None):
+        """Agrupa los datos en una sola pasada; devuelve bordes, clases y frecuencias"""
+        datos = np.asarray(datos, dtype=float)
+        if len(datos) == 0:
+            raise ValueError('No hay datos para agrupar')
+        if conteos is not None:
+            conteos = np.asarray(conteos, dtype=np.int64)
+        resumen = self.resumir(datos, conteos)
+
+        def calcular():
+            bordes = self.calcular_bordes(resumen, estrategia, num_clases=num_clases, ancho=ancho,
+                                          datos=datos, conteos=conteos, max_clases=max_clases)
+            k = len(bordes) - 1
+
+            # Clase de cada dato; como en np.histogram, la última clase incluye su límite superior
+            indices = np.clip(np.searchsorted(bordes, datos, side='right') - 1, 0, k - 1)
+            frecuencias = np.bincount(indices, weights=conteos, minlength=k).astype(np.int64)
+
+            return {
+                'estrategia': estrategia,
+                'bordes': bordes,
+                'clases': [formatear_clase(bordes[i], bordes[i + 1]) for i in range(k)],
+                'frecuencias': frecuencias
+            }
+
+        clave = ('clases', self._huella(datos, conteos), estrategia, num_clases, ancho, max_clases)
+        return self._desde_cache(clave, calcular)
 
 class AnalisisEstadistico:
     def __init__(self):
         self.datos = []
+        # Configuración de /configurar; una solicitud puede reemplazarla sólo para su hilo
+        self._solicitud = threading.local()
         self.es_agrupado = False
         self.es_muestral = True
         self.clases = []
         self.frecuencias = []
-    
+        self.conteos = []
+        self.motor_clases = MotorClases(self._cuantil_ponderado)
+        # Límite de puntos crudos que se entregan a matplotlib por gráfica
+        self.max_puntos_grafica = int(os.environ.get('GRAFICAS_MAX_PUNTOS', 2000))
+        self.semilla_muestreo = int(os.environ.get('GRAFICAS_SEMILLA', 0))
+        # Memoria máxima de cada bloque de remuestras del bootstrap y hilos que los calculan
+        self.bootstrap_max_bytes = int(float(os.environ.get('BOOTSTRAP_MAX_MB', 64)) * 2**20)
+        self.bootstrap_hilos = int(os.environ.get('BOOTSTRAP_HILOS', 1))
+        # Los estadísticos de todas las remuestras se guardan para los percentiles (32 bytes c/u)
+        self.bootstrap_max_remuestras = int(os.environ.get('BOOTSTRAP_MAX_REMUESTRAS', 1_000_000))
+
+    @property
+    def es_agrupado(self):
+        return getattr(self._solicitud, 'es_agrupado', self._es_agrupado)
+
+    @es_agrupado.setter
+    def es_agrupado(self, valor):
+        self._es_agrupado = valor
+
+    @property
+    def es_muestral(self):
+        return getattr(self._solicitud, 'es_muestral', self._es_muestral)
+
+    @es_muestral.setter
+    def es_muestral(self, valor):
+        self._es_muestral = valor
+
+    @contextmanager
+    def configuracion_solicitud(self, data):
+        """Aplica es_muestral/es_agrupado del cuerpo de la solicitud sólo en este hilo.
+
+        Así el resultado no depende de qué worker atendió antes /configurar.
+        """
+        anteriores = dict(vars(self._solicitud))
+        for clave in ('es_muestral', 'es_agrupado'):
+            if clave in (data or {}):
+                setattr(self._solicitud, clave, bool(data[clave]))
+        try:
+            yield
+        finally:
+            vars(self._solicitud).clear()
+            vars(self._solicitud).update(anteriores)
+
+    def _resumir_moda(self, valores_unicos, conteos):
+        """Resume la moda a partir de valores únicos y sus conteos"""
+        max_count = np.max(conteos)
+        modas = valores_unicos[conteos == max_count]
+
+        if len(modas) == 1:
+            return float(modas[0])
+        elif len(modas) == len(valores_unicos):
+            return "No hay moda"
+        else:
+            return [float(m) for m in modas]
+
+    def _redondear_columna(self, valores):
+        """Redondea un arreglo para JSON, usando None en valores no finitos"""
+        valores = np.asarray(valores, dtype=float)
+        redondeados = np.round(valores, 4).tolist()
+        for i in np.flatnonzero(~np.isfinite(valores)):
+            redondeados[i] = None
+        return redondeados
+
     def calcular_estadisticas_basicas(self, datos):
         """Calcula estadísticas básicas para datos desagrupados"""
         datos = np.array(datos)
@@ -30,16 +268,8 @@ class AnalisisEstadistico:
         
         # Calcular moda manualmente para evitar problemas de serialización
         valores_unicos, conteos = np.unique(datos, return_counts=True)
-        max_count = np.max(conteos)
-        modas = valores_unicos[conteos == max_count]
-        
-        if len(modas) == 1:
-            moda = float(modas[0])
-        elif len(modas) == len(valores_unicos):
-            moda = "No hay moda"
-        else:
-            moda = [float(m) for m in modas]
-        
+        moda = self._resumir_moda(valores_unicos, conteos)
+
         # Medidas de dispersión
         if self.es_muestral:
             varianza = float(np.var(datos, ddof=1))
@@ -58,61 +288,524 @@ class AnalisisEstadistico:
             'valor_maximo': round(float(np.max(datos)), 4),
             'rango': round(float(np.max(datos) - np.min(datos)), 4)
         }
-    
-    def calcular_estadisticas_agrupadas(self, clases, frecuencias):
-        """Calcula estadísticas para datos agrupados"""
-        # Calcular puntos medios de las clases
-        puntos_medios = []
-        for clase in clases:
-            if '-' in clase:
-                limites = clase.split('-')
-                punto_medio = (float(limites[0]) + float(limites[1])) / 2
-                puntos_medios.append(punto_medio)
-        
-        puntos_medios = np.array(puntos_medios)
-        frecuencias = np.array(frecuencias)
-        
-        # Media agrupada
-        media = float(np.sum(puntos_medios * frecuencias) / np.sum(frecuencias))
-        
-        # Varianza agrupada
+
+    def _preparar_ponderados(self, valores, conteos):
+        """Ordena y combina pares (valor, conteo), descartando conteos en cero"""
+        valores = np.asarray(valores, dtype=float)
+        conteos = np.asarray(conteos, dtype=float)
+        if valores.shape != conteos.shape:
+            raise ValueError('Los datos y los conteos deben tener la misma longitud')
+        if not np.all(np.isfinite(conteos)) or np.any(conteos != np.round(conteos)):
+            raise ValueError('Los conteos deben ser números enteros')
+        if np.any(conteos < 0):
+            raise ValueError('Los conteos no pueden ser negativos')
+        conteos = conteos.astype(np.int64)
+
+        valores_unicos, inversos = np.unique(valores, return_inverse=True)
+        conteos_unicos = np.bincount(inversos, weights=conteos, minlength=len(valores_unicos))
+        conteos_unicos = conteos_unicos.astype(np.int64)
+
+        presentes = conteos_unicos > 0
+        if not np.any(presentes):
+            raise ValueError('No hay observaciones con conteo mayor a cero')
+        return valores_unicos[presentes], conteos_unicos[presentes]
+
+    def _cuantil_ponderado(self, valores, conteos, q):
+        """Cuantil con interpolación lineal (como np.percentile) sin expandir los datos"""
+        acumulados = np.cumsum(conteos)
+        posicion = (acumulados[-1] - 1) * np.asarray(q, dtype=float)
+        inferior = np.floor(posicion)
+
+        # El dato en la posición k (base 0) es el primer valor cuyo acumulado supera k
+        idx_inf = np.searchsorted(acumulados, inferior, side='right')
+        idx_sup = np.searchsorted(acumulados, np.minimum(inferior + 1, acumulados[-1] - 1), side='right')
+        return valores[idx_inf] + (posicion - inferior) * (valores[idx_sup] - valores[idx_inf])
+
+    def calcular_estadisticas_ponderadas(self, valores, conteos):
+        """Calcula estadísticas básicas a partir de pares (valor, conteo) ya preparados"""
+        n = int(np.sum(conteos))
+
+        # Medidas de tendencia central
+        media = float(np.sum(valores * conteos) / n)
+        mediana = float(self._cuantil_ponderado(valores, conteos, 0.5))
+        moda = self._resumir_moda(valores, conteos)
+
+        # Medidas de dispersión
+        suma_cuadrados = float(np.sum(conteos * (valores - media)**2))
         if self.es_muestral:
-            varianza = float(np.sum(frecuencias * (puntos_medios - media)**2) / (np.sum(frecuencias) - 1))
+            varianza = suma_cuadrados / (n - 1) if n > 1 else float('nan')
         else:
-            varianza = float(np.sum(frecuencias * (puntos_medios - media)**2) / np.sum(frecuencias))
-        
+            varianza = suma_cuadrados / n
         desviacion_std = float(np.sqrt(varianza))
-        
-        # Mediana agrupada (aproximada)
-        n = int(np.sum(frecuencias))
-        frecuencias_acum = np.cumsum(frecuencias)
-        clase_mediana_idx = int(np.where(frecuencias_acum >= n/2)[0][0])
-        
-        # Moda agrupada (clase con mayor frecuencia)
-        clase_modal_idx = int(np.argmax(frecuencias))
-        clase_modal = clases[clase_modal_idx]
-        
-        # Curtosis y sesgo
-        momento3 = float(np.sum(frecuencias * (puntos_medios - media)**3) / np.sum(frecuencias))
-        momento4 = float(np.sum(frecuencias * (puntos_medios - media)**4) / np.sum(frecuencias))
-        
-        sesgo = float(momento3 / (desviacion_std**3))
-        curtosis = float((momento4 / (desviacion_std**4)) - 3)
-        
+
         return {
             'media': round(media, 4),
-            'mediana_aproximada': f"Clase {clase_mediana_idx + 1}: {clases[clase_mediana_idx]}",
-            'moda': f"Clase modal: {clase_modal}",
+            'mediana': round(mediana, 4),
+            'moda': moda,
             'varianza': round(varianza, 4),
             'desviacion_estandar': round(desviacion_std, 4),
-            'sesgo': round(sesgo, 4),
-            'curtosis': round(curtosis, 4)
+            'valor_minimo': round(float(valores[0]), 4),
+            'valor_maximo': round(float(valores[-1]), 4),
+            'rango': round(float(valores[-1] - valores[0]), 4)
+        }
+
+    # Estadísticos que reporta el bootstrap, en el orden de sus columnas
+    ESTADISTICOS_BOOTSTRAP = ('media', 'mediana', 'varianza', 'desviacion_estandar')
+
+    def _bootstrap_indices(self, datos, ddof, rng, tam_bloque):
+        """Estadísticos de un bloque de remuestras: una fila de índices por remuestra"""
+        n = len(datos)
+        muestras = datos[rng.integers(0, n, size=(tam_bloque, n))]
+        varianzas = np.var(muestras, axis=1, ddof=ddof if n > 1 else 0)
+        return np.column_stack([muestras.mean(axis=1), np.median(muestras, axis=1),
+                                varianzas, np.sqrt(varianzas)])
+
+    def _bootstrap_conteos(self, valores, conteos, ddof, rng, tam_bloque):
+        """Estadísticos de un bloque de remuestras de pares (valor, conteo).
+
+        Cada remuestra es un vector de conteos multinomial, así nunca se expanden los datos.
+        """
+        n = int(conteos.sum())
+        remuestras = rng.multinomial(n, conteos / n, size=tam_bloque)
+        # Centrar en la media original evita que la suma de cuadrados se cancele cuando los
+        # valores son grandes comparados con su dispersión
+        centro = conteos @ valores / n
+        centrados = valores - centro
+        desvios_medios = remuestras @ centrados / n
+        medias = centro + desvios_medios
+        suma_cuadrados = remuestras @ centrados**2 - n * desvios_medios**2
+        varianzas = np.maximum(suma_cuadrados, 0) / (n - ddof if n > 1 else n)
+
+        # Mediana interpolada como en _cuantil_ponderado, fila por fila
+        acumulados = np.cumsum(remuestras, axis=1)
+        posicion = (n - 1) * 0.5
+        inferior = np.floor(posicion)
+        idx_inf = np.argmax(acumulados > inferior, axis=1)
+        idx_sup = np.argmax(acumulados > min(inferior + 1, n - 1), axis=1)
+        medianas = valores[idx_inf] + (posicion - inferior) * (valores[idx_sup] - valores[idx_inf])
+        return np.column_stack([medias, medianas, varianzas, np.sqrt(varianzas)])
+
+    def validar_remuestras(self, remuestras):
+        """Convierte a entero el número de remuestras y verifica que esté dentro de los límites"""
+        remuestras = int(remuestras)
+        if remuestras < 1:
+            raise ValueError('El número de remuestras debe ser mayor a cero')
+        if remuestras > self.bootstrap_max_remuestras:
+            raise ValueError(f'El número de remuestras no puede ser mayor a {self.bootstrap_max_remuestras}')
+        return remuestras
+
+    def calcular_intervalos_bootstrap(self, datos, conteos=None, remuestras=1000, nivel=0.95, semilla=0):
+        """Intervalos de confianza por percentiles bootstrap para media, mediana, varianza y desviación.
+
+        Las remuestras se generan en bloques que no exceden bootstrap_max_bytes y se reparten
+        entre bootstrap_hilos. Cada bloque tiene su propia semilla derivada de `semilla`, por lo
+        que el resultado no depende del número de hilos. Cada bloque escribe sus estadísticos
+        en una sola matriz de remuestras x 4, así la memoria total no pasa de
+        32 * bootstrap_max_remuestras bytes más un bloque por hilo.
+        """
+        remuestras = self.validar_remuestras(remuestras)
+        if not 0 < nivel < 1:
+            raise ValueError('El nivel de confianza debe estar entre 0 y 1')
+        # Los hilos del ejecutor no ven la configuración de la solicitud: se pasa explícita
+        ddof = 1 if self.es_muestral else 0
+
+        if conteos is None:
+            datos = np.asarray(datos, dtype=float)
+            if len(datos) == 0:
+                raise ValueError('No hay datos para el bootstrap')
+            # Índices, datos remuestreados y la copia que ordena np.median
+            bytes_por_remuestra = 3 * 8 * len(datos)
+            calcular = functools.partial(self._bootstrap_indices, datos, ddof)
+        else:
+            valores, conteos = self._preparar_ponderados(datos, conteos)
+            # Conteos remuestreados, acumulados y la comparación para la mediana
+            bytes_por_remuestra = 3 * 8 * len(valores)
+            calcular = functools.partial(self._bootstrap_conteos, valores, conteos, ddof)
+
+        tam_bloque = int(max(1, min(remuestras, self.bootstrap_max_bytes // bytes_por_remuestra)))
+        tamanos = [min(tam_bloque, remuestras - inicio) for inicio in range(0, remuestras, tam_bloque)]
+        semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+
+        estadisticos = np.empty((remuestras, len(self.ESTADISTICOS_BOOTSTRAP)))
+
+        def bloque(i):
+            inicio = i * tam_bloque
+            estadisticos[inicio:inicio + tamanos[i]] = calcular(np.random.default_rng(semillas[i]), tamanos[i])
+
+        if self.bootstrap_hilos > 1 and len(tamanos) > 1:
+            with ThreadPoolExecutor(max_workers=self.bootstrap_hilos) as ejecutor:
+                list(ejecutor.map(bloque, range(len(tamanos))))
+        else:
+            for i in range(len(tamanos)):
+                bloque(i)
+
+        errores = np.std(estadisticos, axis=0, ddof=1) if remuestras > 1 else np.zeros(estadisticos.shape[1])
+        alfa = 1 - nivel
+        # overwrite_input reordena la matriz en su lugar en vez de copiarla
+        limites = np.percentile(estadisticos, [100 * alfa / 2, 100 * (1 - alfa / 2)], axis=0,
+                                overwrite_input=True)
+        return {
+            'remuestras': remuestras,
+            'nivel': nivel,
+            'semilla': semilla,
+            'bloques': len(tamanos),
+            'intervalos': {
+                nombre: {'inferior': round(float(limites[0, j]), 4),
+                         'superior': round(float(limites[1, j]), 4),
+                         'error_estandar': round(float(errores[j]), 4)}
+                for j, nombre in enumerate(self.ESTADISTICOS_BOOTSTRAP)
+            }
+        }
+
+    def _modas_por_columna(self, X):
+        """Calcula la moda de cada columna con una sola ordenación de la tabla"""
+        ordenados = np.sort(X, axis=0)
+        n, k = ordenados.shape
+
+        # Marcar el inicio de cada racha de valores iguales dentro de cada columna
+        inicio = np.ones((n, k), dtype=bool)
+        inicio[1:] = ordenados[1:] != ordenados[:-1]
+
+        # Recorrer columna por columna: cada racha recibe un identificador global
+        inicio_t = inicio.T
+        rachas = np.cumsum(inicio_t.ravel()) - 1
+        conteos = np.bincount(rachas)
+        valores = ordenados.T[inicio_t]
+
+        cortes = np.cumsum(inicio.sum(axis=0))[:-1]
+        return [self._resumir_moda(v, c)
+                for v, c in zip(np.split(valores, cortes), np.split(conteos, cortes))]
+
+    def calcular_estadisticas_tabla(self, tabla):
+        """Calcula estadísticas por columna para una tabla de datos desagrupados"""
+        df = pd.DataFrame(tabla, dtype=float)
+        if df.empty:
+            raise ValueError('La tabla no contiene datos')
+        if df.isna().any().any():
+            raise ValueError('Todas las columnas deben tener el mismo número de datos numéricos')
+
+        columnas = [str(c) for c in df.columns]
+        X = df.to_numpy()
+        ddof = 1 if self.es_muestral else 0
+
+        # Medidas de tendencia central y dispersión, todas las columnas a la vez
+        media = X.mean(axis=0)
+        mediana = np.median(X, axis=0)
+        varianza = X.var(axis=0, ddof=ddof)
+        desviacion_std = np.sqrt(varianza)
+        minimo = X.min(axis=0)
+        maximo = X.max(axis=0)
+
+        # Sesgo y curtosis con la misma fórmula que los datos agrupados
+        desviaciones = X - media
+        momento3 = np.mean(desviaciones**3, axis=0)
+        momento4 = np.mean(desviaciones**4, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sesgo = momento3 / desviacion_std**3
+            curtosis = momento4 / desviacion_std**4 - 3
+            correlacion = np.atleast_2d(np.corrcoef(X, rowvar=False))
+
+        return {
+            'columnas': columnas,
+            'n': int(X.shape[0]),
+            'estadisticas': {
+                'media': self._redondear_columna(media),
+                'mediana': self._redondear_columna(mediana),
+                'moda': self._modas_por_columna(X),
+                'varianza': self._redondear_columna(varianza),
+                'desviacion_estandar': self._redondear_columna(desviacion_std),
+                'valor_minimo': self._redondear_columna(minimo),
+                'valor_maximo': self._redondear_columna(maximo),
+                'rango': self._redondear_columna(maximo - minimo),
+                'sesgo': self._redondear_columna(sesgo),
+                'curtosis': self._redondear_columna(curtosis)
+            },
+            'correlacion': [self._redondear_columna(fila) for fila in correlacion]
+        }
+
+    def preparar_clases(self, clases):
+        """Ordena clases "min-max" y obtiene sus bordes continuos y sus puntos medios.
+
+        Devuelve (orden, bordes, puntos_medios); orden es la permutación que ordena las clases
+        (y sus frecuencias) por límite inferior. Los puntos medios son los de las clases tal como
+        se escribieron. Si las clases dejan un hueco entre sí (ej: "10-19", "20-29"), cada borde
+        se pone a la mitad del hueco, como las fronteras reales de clase; los extremos se
+        extienden igual. Los bordes sólo se usan para interpolar mediana, cuartiles y moda.
+        """
+        limites = [limites_clase(clase) for clase in clases]
+        if not limites or None in limites:
+            raise ValueError('Cada clase debe tener el formato min-max')
+        limites = np.array(limites, dtype=float)
+        orden = np.argsort(limites[:, 0], kind='stable')
+        inferiores, superiores = limites[orden].T
+        huecos = inferiores[1:] - superiores[:-1]
+        margen = max(huecos[-1], 0) / 2 if len(huecos) else 0.0
+        bordes = np.concatenate([[inferiores[0] - margen], (superiores[:-1] + inferiores[1:]) / 2,
+                                 [superiores[-1] + margen]])
+        return orden, bordes, (inferiores + superiores) / 2
+
+    def calcular_estadisticas_agrupadas_lote(self, bordes, frecuencias, puntos_medios=None):
+        """Estadísticas de muchas tablas de frecuencias a la vez.
+
+        frecuencias es una matriz (tablas x clases); bordes es un vector de clases + 1 bordes
+        común a todas las tablas o una matriz con los bordes de cada tabla. puntos_medios
+        (opcional, de las mismas formas con una columna menos) reemplaza los puntos medios de
+        los bordes en los momentos. Devuelve un arreglo por estadística con un valor por tabla;
+        las tablas sin frecuencias dan NaN (y -1 en clase_mediana y clase_modal). Los momentos
+        salen de una sola pasada de sumas de potencias; la mediana, los cuartiles y la moda
+        usan las fórmulas de datos agrupados, interpolando dentro de la clase.
+        """
+        frecuencias = np.atleast_2d(np.asarray(frecuencias, dtype=float))
+        bordes = np.asarray(bordes, dtype=float)
+        m, k = frecuencias.shape
+        if bordes.shape[-1] != k + 1:
+            raise ValueError('Debe haber un borde más que clases')
+        if bordes.ndim == 1:
+            bordes = np.broadcast_to(bordes, (m, k + 1))
+        elif bordes.shape[0] != m:
+            raise ValueError('Debe haber una fila de bordes por tabla')
+        if np.any(frecuencias < 0):
+            raise ValueError('Las frecuencias no pueden ser negativas')
+        if np.any(np.diff(bordes, axis=1) <= 0):
+            raise ValueError('Los bordes deben ser crecientes')
+
+        inferiores, anchos = bordes[:, :-1], np.diff(bordes, axis=1)
+        if puntos_medios is None:
+            puntos_medios = inferiores + anchos / 2
+        else:
+            puntos_medios = np.broadcast_to(np.asarray(puntos_medios, dtype=float), (m, k))
+
+        # Las tablas vacías se calculan con n = NaN para que todas sus estadísticas den NaN
+        n = frecuencias.sum(axis=1)
+        vacias = n == 0
+        n = np.where(vacias, np.nan, n)
+
+        # Sumas de potencias de (x - centro); centrar en el punto medio de la tabla evita perder
+        # precisión al pasar de momentos crudos a centrales
+        centro = (puntos_medios[:, 0] + puntos_medios[:, -1]) / 2
+        x = puntos_medios - centro[:, None]
+        x2 = x * x
+        s1 = np.einsum('ij,ij->i', frecuencias, x) / n
+        s2 = np.einsum('ij,ij->i', frecuencias, x2) / n
+        s3 = np.einsum('ij,ij->i', frecuencias, x2 * x) / n
+        s4 = np.einsum('ij,ij->i', frecuencias, x2 * x2) / n
+
+        media = s1 + centro
+        momento2 = np.maximum(s2 - s1**2, 0)
+        momento3 = s3 - 3 * s1 * s2 + 2 * s1**3
+        momento4 = s4 - 4 * s1 * s3 + 6 * s1**2 * s2 - 3 * s1**4
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.es_muestral:
+                varianza = np.where(n > 1, momento2 * n / (n - 1), np.nan)
+            else:
+                varianza = momento2
+            desviacion_std = np.sqrt(varianza)
+            sesgo = momento3 / desviacion_std**3
+            curtosis = momento4 / desviacion_std**4 - 3
+
+        # Cuantiles: L + (q·n - F_anterior) / f · h en la primera clase cuyo acumulado llega a q·n
+        acumuladas = np.cumsum(frecuencias, axis=1)
+        objetivos = n[:, None] * np.array([0.25, 0.5, 0.75])
+        idx = np.argmax(acumuladas[:, None, :] >= objetivos[:, :, None], axis=2)
+        filas = np.arange(m)[:, None]
+        anteriores = np.where(idx > 0, acumuladas[filas, np.maximum(idx - 1, 0)], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cuantiles = (inferiores[filas, idx]
+                         + (objetivos - anteriores) / frecuencias[filas, idx] * anchos[filas, idx])
+
+        # Moda: L + d1 / (d1 + d2) · h, con d1 y d2 las diferencias con las clases vecinas
+        filas = np.arange(m)
+        modal = np.argmax(frecuencias, axis=1)
+        f_modal = frecuencias[filas, modal]
+        f_previa = np.where(modal > 0, frecuencias[filas, np.maximum(modal - 1, 0)], 0)
+        f_siguiente = np.where(modal < k - 1, frecuencias[filas, np.minimum(modal + 1, k - 1)], 0)
+        d1, d2 = f_modal - f_previa, f_modal - f_siguiente
+        with np.errstate(divide='ignore', invalid='ignore'):
+            proporcion = np.where(d1 + d2 > 0, d1 / (d1 + d2), 0.5)
+        moda = np.where(vacias, np.nan, inferiores[filas, modal] + proporcion * anchos[filas, modal])
+
+        return {
+            'n': np.where(vacias, 0, n),
+            'media': media,
+            'mediana': cuantiles[:, 1],
+            'cuartil_1': cuantiles[:, 0],
+            'cuartil_3': cuantiles[:, 2],
+            'moda': moda,
+            'varianza': varianza,
+            'desviacion_estandar': desviacion_std,
+            'sesgo': sesgo,
+            'curtosis': curtosis,
+            'clase_mediana': np.where(vacias, -1, idx[:, 1]),
+            'clase_modal': np.where(vacias, -1, modal)
+        }
+
+    def calcular_estadisticas_agrupadas(self, clases, frecuencias, bordes=None):
+        """Calcula estadísticas para datos agrupados (bordes evita interpretar el texto de las clases)"""
+        if len(frecuencias) != len(clases):
+            raise ValueError('Debe haber una frecuencia por clase')
+        if bordes is None:
+            # Las clases pueden escribirse en cualquier orden; se calculan ordenadas y los
+            # índices de clase se devuelven en el orden original
+            orden, bordes, puntos_medios = self.preparar_clases(clases)
+            frecuencias = np.asarray(frecuencias, dtype=float)[orden]
+        else:
+            orden, puntos_medios = np.arange(len(clases)), None
+        if not np.any(np.asarray(frecuencias) > 0):
+            raise ValueError('Debe haber al menos una frecuencia mayor a cero')
+
+        lote = self.calcular_estadisticas_agrupadas_lote(bordes, [frecuencias], puntos_medios)
+        valores = {nombre: arreglo[0] for nombre, arreglo in lote.items()}
+        clase_mediana_idx = int(orden[valores['clase_mediana']])
+        clase_modal_idx = int(orden[valores['clase_modal']])
+
+        return {
+            'media': round(float(valores['media']), 4),
+            'mediana': round(float(valores['mediana']), 4),
+            'mediana_aproximada': f"Clase {clase_mediana_idx + 1}: {clases[clase_mediana_idx]}",
+            'cuartil_1': round(float(valores['cuartil_1']), 4),
+            'cuartil_3': round(float(valores['cuartil_3']), 4),
+            'moda': f"Clase modal: {clases[clase_modal_idx]}",
+            'moda_agrupada': round(float(valores['moda']), 4),
+            'varianza': round(float(valores['varianza']), 4),
+            'desviacion_estandar': round(float(valores['desviacion_estandar']), 4),
+            'sesgo': round(float(valores['sesgo']), 4),
+            'curtosis': round(float(valores['curtosis']), 4)
         }
     
-    def crear_tabla_frecuencias(self, datos):
+    def _extremos_moviles(self, datos, ventana):
+        """Mínimo y máximo de cada ventana deslizante (paso 1) con colas monótonas, en O(n)"""
+        valores = datos.tolist()
+        num_ventanas = len(valores) - ventana + 1
+        minimos = np.empty(num_ventanas)
+        maximos = np.empty(num_ventanas)
+        cola_min = deque()
+        cola_max = deque()
+
+        for i, valor in enumerate(valores):
+            # Cada cola guarda índices cuyos valores son crecientes (mín) o decrecientes (máx)
+            while cola_min and valores[cola_min[-1]] >= valor:
+                cola_min.pop()
+            while cola_max and valores[cola_max[-1]] <= valor:
+                cola_max.pop()
+            cola_min.append(i)
+            cola_max.append(i)
+
+            inicio = i - ventana + 1
+            if cola_min[0] < inicio:
+                cola_min.popleft()
+            if cola_max[0] < inicio:
+                cola_max.popleft()
+            if inicio >= 0:
+                minimos[inicio] = valores[cola_min[0]]
+                maximos[inicio] = valores[cola_max[0]]
+
+        return minimos, maximos
+
+    def calcular_estadisticas_moviles(self, datos, ventana, paso=1):
+        """Calcula media, varianza, mínimo, máximo y rango por ventana sobre una serie ordenada.
+
+        Con paso=1 las ventanas son deslizantes; con paso=ventana son fijas (sin traslape).
+        """
+        datos = np.asarray(datos, dtype=float)
+        n = len(datos)
+        ventana = int(ventana)
+        paso = int(paso)
+        if ventana < 1 or paso < 1:
+            raise ValueError('La ventana y el paso deben ser enteros positivos')
+        if ventana > n:
+            raise ValueError(f'La ventana ({ventana}) es mayor que la cantidad de datos ({n})')
+
+        ddof = 1 if self.es_muestral else 0
+        if ventana - ddof < 1:
+            raise ValueError('La varianza muestral requiere ventanas de al menos 2 datos')
+        inicios = np.arange(0, n - ventana + 1, paso)
+
+        # Sumas por ventana con sumas acumuladas, por bloques de unos pocos miles de datos. Cada
+        # bloque se centra en su propia media: en series con tendencia, una suma acumulada global
+        # de cuadrados crece sin límite y s2 - s1²/n pierde toda la precisión
+        media = np.empty(len(inicios))
+        varianza = np.empty(len(inicios))
+        por_bloque = max(1, max(4 * ventana, 4096) // paso)
+        for k in range(0, len(inicios), por_bloque):
+            sel = inicios[k:k + por_bloque]
+            segmento = datos[sel[0]:sel[-1] + ventana]
+            ancla = segmento.mean()
+            centrados = segmento - ancla
+            suma = np.concatenate(([0.0], np.cumsum(centrados)))
+            suma_cuadrados = np.concatenate(([0.0], np.cumsum(centrados**2)))
+            relativos = sel - sel[0]
+            s1 = suma[relativos + ventana] - suma[relativos]
+            s2 = suma_cuadrados[relativos + ventana] - suma_cuadrados[relativos]
+            media[k:k + por_bloque] = s1 / ventana + ancla
+            varianza[k:k + por_bloque] = np.maximum(s2 - s1**2 / ventana, 0) / (ventana - ddof)
+
+        if paso >= ventana:
+            # Ventanas sin traslape: cada dato se visita una sola vez
+            indices = inicios[:, None] + np.arange(ventana)
+            minimos = datos[indices].min(axis=1)
+            maximos = datos[indices].max(axis=1)
+        else:
+            minimos, maximos = self._extremos_moviles(datos, ventana)
+            minimos, maximos = minimos[inicios], maximos[inicios]
+
+        return {
+            'ventana': ventana,
+            'paso': paso,
+            'inicio': inicios.tolist(),
+            'media': self._redondear_columna(media),
+            'varianza': self._redondear_columna(varianza),
+            'desviacion_estandar': self._redondear_columna(np.sqrt(varianza)),
+            'minimo': self._redondear_columna(minimos),
+            'maximo': self._redondear_columna(maximos),
+            'rango': self._redondear_columna(maximos - minimos)
+        }
+
+    def generar_grafica_tendencia(self, datos, moviles, dpi=300):
+        """Gráfica de la serie con la media móvil y la banda mínimo-máximo por ventana"""
+        inicios = np.asarray(moviles['inicio'])
+        centros = inicios + (moviles['ventana'] - 1) / 2
+        media = np.asarray(moviles['media'], dtype=float)
+        minimos = np.asarray(moviles['minimo'], dtype=float)
+        maximos = np.asarray(moviles['maximo'], dtype=float)
+
+        # Con series largas se dibuja una selección uniforme de puntos
+        if len(datos) > self.max_puntos_grafica:
+            sel_datos = np.linspace(0, len(datos) - 1, self.max_puntos_grafica).astype(np.int64)
+        else:
+            sel_datos = np.arange(len(datos))
+        if len(inicios) > self.max_puntos_grafica:
+            sel = np.linspace(0, len(inicios) - 1, self.max_puntos_grafica).astype(np.int64)
+        else:
+            sel = np.arange(len(inicios))
+
+        with candado_pyplot:
+            plt.figure(figsize=(12, 6))
+            plt.plot(sel_datos, np.asarray(datos, dtype=float)[sel_datos], color='lightgray', linewidth=1, label='Datos')
+            plt.fill_between(centros[sel], minimos[sel], maximos[sel], color='skyblue', alpha=0.4, label='Mínimo - Máximo')
+            plt.plot(centros[sel], media[sel], color='red', linewidth=2, label='Media móvil')
+            plt.title(f'Tendencia (ventana de {moviles["ventana"]} datos)')
+            plt.xlabel('Posición')
+            plt.ylabel('Valores')
+            plt.grid(True, alpha=0.3)
+            plt.legend()
+
+            return self._figura_a_base64(dpi)
+
+    def crear_tabla_frecuencias(self, datos, max_filas=None):
         """Crea tabla de frecuencias para datos desagrupados"""
         valores_unicos, frecuencias = np.unique(datos, return_counts=True)
-        n_total = len(datos)
+        return self.crear_tabla_frecuencias_ponderada(valores_unicos, frecuencias, max_filas=max_filas)
+
+    def crear_tabla_frecuencias_ponderada(self, valores_unicos, frecuencias, max_filas=None):
+        """Crea tabla de frecuencias a partir de valores únicos ordenados y sus conteos.
+
+        Si hay más de max_filas valores distintos, la tabla se agrupa en max_filas intervalos.
+        """
+        if max_filas is not None and len(valores_unicos) > max_filas:
+            return self.crear_tabla_frecuencias_agrupada(valores_unicos, max_filas, conteos=frecuencias)
+
+        n_total = int(np.sum(frecuencias))
         
         tabla = []
         frecuencia_acumulada = 0
@@ -132,22 +825,154 @@ class AnalisisEstadistico:
         
         return tabla
     
-    def generar_graficas(self, datos, tipo='desagrupado', clases=None, frecuencias=None):
-        """Genera gráficas según el tipo de datos"""
-        graficas = {}
-        
+    def crear_tabla_frecuencias_agrupada(self, datos, num_clases, conteos=None):
+        """Resume los datos en una tabla de frecuencias por intervalos de igual amplitud"""
+        agrupacion = self.motor_clases.agrupar(datos, conteos, num_clases=num_clases)
+        frecuencias = agrupacion['frecuencias']
+        n_total = float(np.sum(frecuencias))
+        acumuladas = np.cumsum(frecuencias)
+
+        return [{
+            'valor': agrupacion['clases'][i],
+            'frecuencia': int(frecuencias[i]),
+            'frecuencia_relativa': round(float(frecuencias[i]) / n_total, 4),
+            'frecuencia_acumulada': int(acumuladas[i]),
+            'frecuencia_relativa_acumulada': round(float(acumuladas[i]) / n_total, 4)
+        } for i in range(len(frecuencias))]
+
+    def _figura_a_base64(self, dpi=300):
+        """Guarda la figura actual como PNG en base64 y la cierra"""
+        img_buffer = io.BytesIO()
+        plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=dpi)
+        img_buffer.seek(0)
+        img_string = base64.b64encode(img_buffer.read()).decode()
+        plt.close()
+        return img_string
+
+    def _estadisticas_caja(self, valores, conteos=None):
+        """Calcula los elementos del diagrama de caja (como plt.boxplot) sobre todos los datos"""
+        if conteos is None:
+            q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+        else:
+            q1, mediana, q3 = self._cuantil_ponderado(valores, conteos, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        dentro = (valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)
+
+        return {
+            'med': mediana,
+            'q1': q1,
+            'q3': q3,
+            'whislo': min(float(np.min(valores[dentro])), q1),
+            'whishi': max(float(np.max(valores[dentro])), q3),
+            'fliers': valores[~dentro]
+        }
+
+    def detectar_atipicos(self, valores, conteos=None, caja=None, umbral_z=3.0, umbral_mad=3.5,
+                          pagina=0, tam_pagina=100):
+        """Detecta datos atípicos con las cercas IQR, la puntuación z y la MAD (z modificada).
+
+        Reutiliza los cuartiles del diagrama de caja si se pasan en `caja`. Con conteos, los
+        valores son únicos y ordenados, los índices se refieren a ellos y los totales cuentan
+        observaciones. Los valores e índices de cada método se entregan por páginas.
+        """
+        valores = np.asarray(valores, dtype=float)
+        if caja is None:
+            caja = self._estadisticas_caja(valores, conteos)
+        pesos = np.ones(len(valores)) if conteos is None else np.asarray(conteos, dtype=float)
+        n = pesos.sum()
+
+        # Cercas de Tukey con los cuartiles compartidos
+        iqr = caja['q3'] - caja['q1']
+        cercas = (caja['q1'] - 1.5 * iqr, caja['q3'] + 1.5 * iqr)
+
+        # Puntuación z con los mismos momentos que las estadísticas básicas
+        media = float(pesos @ valores / n)
+        ddof = 1 if self.es_muestral and n > 1 else 0
+        desviacion = float(np.sqrt(pesos @ (valores - media)**2 / (n - ddof)))
+        limites_z = (media - umbral_z * desviacion, media + umbral_z * desviacion)
+
+        # z modificada de Iglewicz y Hoaglin: 0.6745 * (x - mediana) / MAD
+        desvios = np.abs(valores - caja['med'])
+        if conteos is None:
+            mad = float(np.median(desvios))
+        else:
+            orden = np.argsort(desvios, kind='stable')
+            mad = float(self._cuantil_ponderado(desvios[orden], pesos[orden], 0.5))
+        limites_mad = (caja['med'] - umbral_mad * mad / 0.6745, caja['med'] + umbral_mad * mad / 0.6745)
+
+        inicio = max(0, int(pagina)) * int(tam_pagina)
+        resultado = {'pagina': int(pagina), 'tam_pagina': int(tam_pagina)}
+        for metodo, (inferior, superior), umbral in (('iqr', cercas, 1.5), ('z', limites_z, umbral_z),
+                                                     ('mad', limites_mad, umbral_mad)):
+            # Con desviación o MAD en cero no hay escala: ningún dato se marca
+            if metodo != 'iqr' and superior == inferior:
+                indices = np.empty(0, dtype=np.int64)
+            else:
+                indices = np.flatnonzero((valores < inferior) | (valores > superior))
+            pagina_indices = indices[inicio:inicio + int(tam_pagina)]
+            resultado[metodo] = {
+                'umbral': umbral,
+                'limite_inferior': round(float(inferior), 4),
+                'limite_superior': round(float(superior), 4),
+                'total': int(pesos[indices].sum()),
+                'total_valores': int(len(indices)),
+                'proporcion': round(float(pesos[indices].sum() / n), 4),
+                'indices': pagina_indices.tolist(),
+                'valores': self._redondear_columna(valores[pagina_indices])
+            }
+        return resultado
+
+    def muestrear_extremos(self, valores, max_puntos):
+        """Muestreo estratificado y reproducible que siempre conserva el mínimo y el máximo.
+
+        Ordena los valores, los divide en max_puntos estratos de igual tamaño y toma uno al azar
+        (con la semilla configurada) de cada estrato; el primero y el último son los extremos.
+        """
+        valores = np.sort(np.asarray(valores, dtype=float))
+        n = len(valores)
+        if n <= max_puntos:
+            return valores
+        if max_puntos < 2:
+            return valores[[0, -1]][:max_puntos]
+
+        rng = np.random.default_rng(self.semilla_muestreo)
+        limites = np.linspace(0, n, max_puntos + 1).astype(np.int64)
+        idx = limites[:-1] + (rng.random(max_puntos) * (limites[1:] - limites[:-1])).astype(np.int64)
+        idx[0], idx[-1] = 0, n - 1
+        return valores[idx]
+
+    # Entradas de iterar_graficas que no son gráficas y se informan en su propia sección
+    SECCIONES_NO_GRAFICAS = ('atipicos', 'muestreo')
+
+    def generar_graficas(self, datos, tipo='desagrupado', clases=None, frecuencias=None, conteos=None, dpi=300):
+        """Genera gráficas según el tipo de datos (con conteos, datos son valores únicos ordenados)"""
+        return {nombre: valor for nombre, valor in self.iterar_graficas(datos, tipo=tipo, clases=clases,
+                                                                         frecuencias=frecuencias,
+                                                                         conteos=conteos, dpi=dpi)
+                if nombre not in self.SECCIONES_NO_GRAFICAS}
+
+    def iterar_graficas(self, datos, tipo='desagrupado', clases=None, frecuencias=None, conteos=None, dpi=300):
+        """Genera las gráficas una por una como pares (nombre, valor), en cuanto se dibujan.
+
+        Para datos desagrupados también entrega ('atipicos', {...}) con los datos atípicos y
+        termina con ('muestreo', {...}), que resume cuántos puntos se dibujaron.
+        """
         if tipo == 'desagrupado':
-            # Histograma
-            plt.figure(figsize=(10, 6))
-            n, bins, patches = plt.hist(datos, bins='auto', alpha=0.7, color='skyblue', edgecolor='black')
-            plt.title('Histograma')
-            plt.xlabel('Valores')
-            plt.ylabel('Frecuencia')
-            plt.grid(True, alpha=0.3)
+            # Con una lista, matplotlib recorre los datos elemento por elemento
+            datos = np.asarray(datos, dtype=float)
+            
+            # Histograma: las frecuencias se cuentan con todos los datos y matplotlib
+            # sólo recibe una barra por intervalo
+            agrupacion = self.motor_clases.agrupar(datos, conteos, estrategia='auto')
+            bordes, frecuencias_hist = agrupacion['bordes'], agrupacion['frecuencias']
             
             # Detectar sesgo visual
-            media = float(np.mean(datos))
-            mediana = float(np.median(datos))
+            if conteos is None:
+                media = float(np.mean(datos))
+                mediana = float(np.median(datos))
+            else:
+                media = float(np.sum(datos * conteos) / np.sum(conteos))
+                mediana = float(self._cuantil_ponderado(datos, conteos, 0.5))
             if media > mediana:
                 sesgo_visual = "derecha (positivo)"
             elif media < mediana:
@@ -155,104 +980,581 @@ class AnalisisEstadistico:
             else:
                 sesgo_visual = "simétrico"
             
-            plt.axvline(media, color='red', linestyle='--', label=f'Media: {media:.2f}')
-            plt.axvline(mediana, color='green', linestyle='--', label=f'Mediana: {mediana:.2f}')
-            plt.legend()
+            with candado_pyplot:
+                plt.figure(figsize=(10, 6))
+                n, bins, patches = plt.hist(bordes[:-1], bins=bordes, weights=frecuencias_hist,
+                                            alpha=0.7, color='skyblue', edgecolor='black')
+                plt.title('Histograma')
+                plt.xlabel('Valores')
+                plt.ylabel('Frecuencia')
+                plt.grid(True, alpha=0.3)
+                
+                plt.axvline(media, color='red', linestyle='--', label=f'Media: {media:.2f}')
+                plt.axvline(mediana, color='green', linestyle='--', label=f'Mediana: {mediana:.2f}')
+                plt.legend()
+                
+                # Convertir a base64
+                img_string = self._figura_a_base64(dpi)
             
-            # Convertir a base64
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-            img_buffer.seek(0)
-            img_string = base64.b64encode(img_buffer.read()).decode()
-            plt.close()
+            yield 'histograma', img_string
+            yield 'sesgo_visual', sesgo_visual
             
-            graficas['histograma'] = img_string
-            graficas['sesgo_visual'] = sesgo_visual
+            # Diagrama de caja y bigotes: cuartiles y bigotes exactos, atípicos muestreados
+            caja = self._estadisticas_caja(datos, conteos)
+            yield 'atipicos', self.detectar_atipicos(datos, conteos, caja=caja)
+            fliers_totales = len(caja['fliers'])
+            caja['fliers'] = self.muestrear_extremos(caja['fliers'], self.max_puntos_grafica)
+            with candado_pyplot:
+                plt.figure(figsize=(8, 6))
+                plt.gca().bxp([caja], patch_artist=True,
+                              boxprops={'facecolor': 'lightblue', 'alpha': 0.7})
+                plt.title('Diagrama de Caja y Bigotes')
+                plt.ylabel('Valores')
+                plt.grid(True, alpha=0.3)
             
-            # Diagrama de caja y bigotes
-            plt.figure(figsize=(8, 6))
-            plt.boxplot(datos, vert=True, patch_artist=True,
-                       boxprops={'facecolor': 'lightblue', 'alpha': 0.7})
-            plt.title('Diagrama de Caja y Bigotes')
-            plt.ylabel('Valores')
-            plt.grid(True, alpha=0.3)
+                img_string = self._figura_a_base64(dpi)
             
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-            img_buffer.seek(0)
-            img_string = base64.b64encode(img_buffer.read()).decode()
-            plt.close()
+            yield 'boxplot', img_string
             
-            graficas['boxplot'] = img_string
+            puntos_dibujados = len(frecuencias_hist) + len(caja['fliers'])
+            yield 'muestreo', {
+                'puntos_totales': int(len(datos) if conteos is None else np.sum(conteos)),
+                'puntos_dibujados': int(puntos_dibujados),
+                'fliers_totales': int(fliers_totales),
+                'fliers_dibujados': int(len(caja['fliers'])),
+                'tasa_fliers': round(len(caja['fliers']) / fliers_totales, 4) if fliers_totales else 1.0
+            }
             
         elif tipo == 'agrupado' and clases and frecuencias:
             # Histograma para datos agrupados
-            plt.figure(figsize=(10, 6))
+            with candado_pyplot:
+                plt.figure(figsize=(10, 6))
             
-            # Crear posiciones para las barras
-            x_pos = range(len(clases))
-            plt.bar(x_pos, frecuencias, alpha=0.7, color='skyblue', edgecolor='black')
-            plt.title('Histograma - Datos Agrupados')
-            plt.xlabel('Clases')
-            plt.ylabel('Frecuencia')
-            plt.xticks(x_pos, clases, rotation=45)
-            plt.grid(True, alpha=0.3)
+                # Crear posiciones para las barras
+                x_pos = range(len(clases))
+                plt.bar(x_pos, frecuencias, alpha=0.7, color='skyblue', edgecolor='black')
+                plt.title('Histograma - Datos Agrupados')
+                plt.xlabel('Clases')
+                plt.ylabel('Frecuencia')
+                plt.xticks(x_pos, clases, rotation=45)
+                plt.grid(True, alpha=0.3)
             
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-            img_buffer.seek(0)
-            img_string = base64.b64encode(img_buffer.read()).decode()
-            plt.close()
+                img_string = self._figura_a_base64(dpi)
             
-            graficas['histograma'] = img_string
+            yield 'histograma', img_string
             
             # Gráfica X-R (Promedios y Rangos) - simulada para datos agrupados
-            plt.figure(figsize=(12, 8))
+            with candado_pyplot:
+                plt.figure(figsize=(12, 8))
             
-            # Subgráfica 1: Gráfica X (promedios)
-            plt.subplot(2, 1, 1)
-            puntos_medios = []
-            for clase in clases:
-                if '-' in clase:
-                    limites = clase.split('-')
-                    punto_medio = (float(limites[0]) + float(limites[1])) / 2
-                    puntos_medios.append(punto_medio)
+                # Subgráfica 1: Gráfica X (promedios)
+                plt.subplot(2, 1, 1)
+                puntos_medios = []
+                for clase in clases:
+                    limites = limites_clase(clase)
+                    if limites:
+                        puntos_medios.append((limites[0] + limites[1]) / 2)
             
-            plt.plot(range(len(puntos_medios)), puntos_medios, 'bo-', linewidth=2, markersize=6)
-            plt.title('Gráfica X (Promedios por Clase)')
-            plt.ylabel('Valor Promedio')
-            plt.grid(True, alpha=0.3)
+                plt.plot(range(len(puntos_medios)), puntos_medios, 'bo-', linewidth=2, markersize=6)
+                plt.title('Gráfica X (Promedios por Clase)')
+                plt.ylabel('Valor Promedio')
+                plt.grid(True, alpha=0.3)
             
-            # Subgráfica 2: Gráfica R (rangos)
-            plt.subplot(2, 1, 2)
-            rangos = []
-            for clase in clases:
-                if '-' in clase:
-                    limites = clase.split('-')
-                    rango = float(limites[1]) - float(limites[0])
-                    rangos.append(rango)
+                # Subgráfica 2: Gráfica R (rangos)
+                plt.subplot(2, 1, 2)
+                rangos = []
+                for clase in clases:
+                    limites = limites_clase(clase)
+                    if limites:
+                        rangos.append(limites[1] - limites[0])
             
-            plt.plot(range(len(rangos)), rangos, 'ro-', linewidth=2, markersize=6)
-            plt.title('Gráfica R (Rangos por Clase)')
-            plt.xlabel('Número de Clase')
-            plt.ylabel('Rango')
-            plt.grid(True, alpha=0.3)
+                plt.plot(range(len(rangos)), rangos, 'ro-', linewidth=2, markersize=6)
+                plt.title('Gráfica R (Rangos por Clase)')
+                plt.xlabel('Número de Clase')
+                plt.ylabel('Rango')
+                plt.grid(True, alpha=0.3)
             
-            plt.tight_layout()
+                plt.tight_layout()
             
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-            img_buffer.seek(0)
-            img_string = base64.b64encode(img_buffer.read()).decode()
-            plt.close()
+                img_string = self._figura_a_base64(dpi)
             
-            graficas['grafica_xr'] = img_string
-        
-        return graficas
+            yield 'grafica_xr', img_string
+
+class SolicitudRechazada(Exception):
+    """La solicitud excede el presupuesto de costo o el límite de concurrencia del cliente"""
+
+
+class ControlAdmision:
+    """Estima el costo de cada análisis y decide si se atiende completo, degradado o se rechaza.
+
+    El costo se expresa en milisegundos aproximados de un worker. Además limita cuántas
+    solicitudes simultáneas puede tener cada cliente; las que excedan el límite esperan
+    hasta espera_max segundos antes de rechazarse. Los límites son por proceso de gunicorn.
+    """
+
+    # Costos aproximados (ms) medidos con matplotlib Agg; el costo por dato incluye leer el JSON
+    COSTO_POR_DATO = 1e-3
+    COSTO_POR_FILA_TABLA = 1e-2
+    COSTO_BASE_GRAFICA_300DPI = 300.0
+    COSTO_POR_PUNTO_GRAFICA = 2.5e-4
+    COSTO_POR_DATO_REMUESTRA = 3.5e-5
+    # Costo fijo de cada remuestra (generarla, sus estadísticos y los percentiles), aun con pocos datos
+    COSTO_POR_REMUESTRA = 3e-4
+
+    def __init__(self, presupuesto, max_por_cliente, espera_max, dpi_degradado=100, max_filas_degradado=1000,
+                 max_puntos_grafica=None, min_remuestras_degradado=1000):
+        self.presupuesto = presupuesto
+        # En modo degradado el bootstrap usa menos remuestras, pero no menos que este mínimo
+        self.min_remuestras_degradado = min_remuestras_degradado
+        # Puntos que llegan a matplotlib por gráfica: barras del histograma más los atípicos
+        # muestreados; None si se dibujan todos los datos
+        self.max_puntos_grafica = max_puntos_grafica
+        self.max_por_cliente = max_por_cliente
+        self.espera_max = espera_max
+        self.dpi_degradado = dpi_degradado
+        self.max_filas_degradado = max_filas_degradado
+
+        self._condicion = threading.Condition()
+        self._activas = {}
+        self.metricas = {
+            'completas': 0,
+            'degradadas': 0,
+            'rechazadas_costo': 0,
+            'encoladas': 0,
+            'rechazadas_concurrencia': 0
+        }
+
+    def estimar_costo(self, n, n_unicos, num_graficas, dpi=300, max_filas=None, remuestras=0):
+        """Estima el costo en ms de un análisis con n datos y n_unicos valores distintos"""
+        filas = n_unicos if max_filas is None else min(n_unicos, max_filas)
+        puntos = n if self.max_puntos_grafica is None else min(n, self.max_puntos_grafica)
+        costo_grafica = self.COSTO_BASE_GRAFICA_300DPI * (dpi / 300) ** 2 + self.COSTO_POR_PUNTO_GRAFICA * puntos
+        return (self.COSTO_POR_DATO * n + self.COSTO_POR_FILA_TABLA * filas + num_graficas * costo_grafica
+                + self.costo_remuestra(n) * remuestras)
+
+    def costo_remuestra(self, n):
+        """Costo en ms de cada remuestra bootstrap de n datos"""
+        return self.COSTO_POR_DATO_REMUESTRA * n + self.COSTO_POR_REMUESTRA
+
+    def planificar(self, n, n_unicos, num_graficas, remuestras=0):
+        """Devuelve la decisión y las opciones con las que debe ejecutarse el análisis"""
+        costo = self.estimar_costo(n, n_unicos, num_graficas, remuestras=remuestras)
+        if costo <= self.presupuesto:
+            self._contar('completas')
+            return {'decision': 'completa', 'costo_estimado': round(costo, 1), 'opciones': {}}
+
+        opciones = {'dpi': self.dpi_degradado, 'max_filas_tabla': self.max_filas_degradado}
+        costo_degradado = self.estimar_costo(n, n_unicos, num_graficas, dpi=self.dpi_degradado,
+                                             max_filas=self.max_filas_degradado, remuestras=remuestras)
+        if costo_degradado <= self.presupuesto:
+            self._contar('degradadas')
+            return {'decision': 'degradada', 'costo_estimado': round(costo_degradado, 1), 'opciones': opciones}
+
+        if remuestras:
+            # Tantas remuestras como quepan en el presupuesto después del resto del análisis
+            costo_fijo = self.estimar_costo(n, n_unicos, num_graficas, dpi=self.dpi_degradado,
+                                            max_filas=self.max_filas_degradado)
+            posibles = int((self.presupuesto - costo_fijo) / self.costo_remuestra(n))
+            if posibles >= min(self.min_remuestras_degradado, remuestras):
+                opciones['remuestras'] = posibles
+                costo_degradado = costo_fijo + self.costo_remuestra(n) * posibles
+                self._contar('degradadas')
+                return {'decision': 'degradada', 'costo_estimado': round(costo_degradado, 1), 'opciones': opciones}
+
+        self._contar('rechazadas_costo')
+        raise SolicitudRechazada(f'La solicitud es demasiado costosa (~{costo_degradado / 1000:.1f} s); '
+                                 'reduce la cantidad de datos')
+
+    def ocupar(self, cliente):
+        """Reserva un lugar para el cliente, esperando si ya tiene el máximo de solicitudes activas"""
+        with self._condicion:
+            if self._activas.get(cliente, 0) >= self.max_por_cliente:
+                self.metricas['encoladas'] += 1
+                libre = self._condicion.wait_for(
+                    lambda: self._activas.get(cliente, 0) < self.max_por_cliente, timeout=self.espera_max)
+                if not libre:
+                    self.metricas['rechazadas_concurrencia'] += 1
+                    raise SolicitudRechazada('Demasiadas solicitudes simultáneas; intenta más tarde')
+            self._activas[cliente] = self._activas.get(cliente, 0) + 1
+
+    @contextmanager
+    def lugar(self, cliente):
+        """Ocupa un lugar para el cliente mientras dura el bloque"""
+        self.ocupar(cliente)
+        try:
+            yield
+        finally:
+            self.liberar(cliente)
+
+    def liberar(self, cliente):
+        with self._condicion:
+            self._activas[cliente] -= 1
+            if self._activas[cliente] == 0:
+                del self._activas[cliente]
+            self._condicion.notify_all()
+
+    def _contar(self, metrica):
+        with self._condicion:
+            self.metricas[metrica] += 1
+
+    def resumen(self):
+        with self._condicion:
+            return {
+                'metricas': dict(self.metricas),
+                'solicitudes_activas': sum(self._activas.values()),
+                'presupuesto_ms': self.presupuesto,
+                'max_por_cliente': self.max_por_cliente
+            }
+
+class AlmacenAnalisis:
+    """Guarda en SQLite los conjuntos de datos, sus resúmenes y sus gráficas.
+
+    Cada conjunto se identifica por un id y por la huella (SHA-256) de su contenido; los datos
+    se guardan como un .npz comprimido. Un mismo conjunto puede tener varios análisis, uno por
+    configuración (muestral/poblacional, resolución, etc.), con las gráficas como PNG binario.
+    Los conjuntos más antiguos que max_dias o que excedan max_conjuntos se borran al guardar,
+    y los que pesan más de max_bytes_conjunto (comprimidos) no se guardan.
+    """
+
+    def __init__(self, ruta, max_conjuntos=None, max_dias=None, max_bytes_conjunto=None):
+        self.ruta = ruta
+        self.max_conjuntos = max_conjuntos
+        self.max_dias = max_dias
+        self.max_bytes_conjunto = max_bytes_conjunto
+        with closing(self._conectar()) as con, con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript('''
+                CREATE TABLE IF NOT EXISTS datasets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    huella TEXT NOT NULL UNIQUE,
+                    tipo TEXT NOT NULL,
+                    forma TEXT NOT NULL,
+                    datos BLOB NOT NULL,
+                    creado TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS resumenes (
+                    dataset_id INTEGER NOT NULL REFERENCES datasets(id),
+                    configuracion TEXT NOT NULL,
+                    resultado TEXT NOT NULL,
+                    creado TEXT NOT NULL,
+                    PRIMARY KEY (dataset_id, configuracion)
+                );
+                CREATE TABLE IF NOT EXISTS graficas (
+                    dataset_id INTEGER NOT NULL REFERENCES datasets(id),
+                    configuracion TEXT NOT NULL,
+                    nombre TEXT NOT NULL,
+                    imagen BLOB,
+                    texto TEXT,
+                    PRIMARY KEY (dataset_id, configuracion, nombre)
+                );
+            ''')
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def huella(self, tipo, arreglos):
+        huella = hashlib.sha256(tipo.encode())
+        for nombre in sorted(arreglos):
+            arreglo = np.ascontiguousarray(arreglos[nombre])
+            huella.update(f'{nombre}:{arreglo.dtype.str}:{arreglo.shape}'.encode())
+            huella.update(arreglo.tobytes())
+        return huella.hexdigest()
+
+    def buscar_resultado(self, huella, configuracion):
+        """Devuelve (dataset_id, resultado, graficas) si ya se analizó con esa configuración"""
+        clave = json.dumps(configuracion, sort_keys=True)
+        with closing(self._conectar()) as con:
+            fila = con.execute(
+                'SELECT d.id, r.resultado FROM datasets d JOIN resumenes r ON r.dataset_id = d.id '
+                'WHERE d.huella = ? AND r.configuracion = ?', (huella, clave)).fetchone()
+            if fila is None:
+                return None
+            graficas = con.execute(
+                'SELECT nombre, imagen, texto FROM graficas WHERE dataset_id = ? AND configuracion = ?',
+                (fila[0], clave)).fetchall()
+
+        return fila[0], json.loads(fila[1]), {
+            nombre: texto if imagen is None else base64.b64encode(imagen).decode()
+            for nombre, imagen, texto in graficas
+        }
+
+    def guardar(self, huella, tipo, arreglos, configuracion, resultado, graficas):
+        """Guarda el conjunto (si es nuevo) y su análisis; devuelve el id del conjunto.
+
+        Devuelve None si el conjunto excede max_bytes_conjunto y no se guardó.
+        """
+        clave = json.dumps(configuracion, sort_keys=True)
+        ahora = datetime.now(timezone.utc).isoformat()
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arreglos)
+        if self.max_bytes_conjunto is not None and buffer.tell() > self.max_bytes_conjunto:
+            return None
+        forma = {nombre: len(arreglo) for nombre, arreglo in arreglos.items()}
+
+        with closing(self._conectar()) as con, con:
+            fila = con.execute('SELECT id FROM datasets WHERE huella = ?', (huella,)).fetchone()
+            if fila is None:
+                con.execute('INSERT OR IGNORE INTO datasets (huella, tipo, forma, datos, creado) VALUES (?, ?, ?, ?, ?)',
+                            (huella, tipo, json.dumps(forma), buffer.getvalue(), ahora))
+                fila = con.execute('SELECT id FROM datasets WHERE huella = ?', (huella,)).fetchone()
+            dataset_id = fila[0]
+            con.execute('INSERT OR REPLACE INTO resumenes (dataset_id, configuracion, resultado, creado) '
+                        'VALUES (?, ?, ?, ?)', (dataset_id, clave, json.dumps(resultado), ahora))
+            con.executemany(
+                'INSERT OR REPLACE INTO graficas (dataset_id, configuracion, nombre, imagen, texto) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(dataset_id, clave, nombre, None, valor) if nombre == 'sesgo_visual'
+                 else (dataset_id, clave, nombre, base64.b64decode(valor), None)
+                 for nombre, valor in graficas.items()])
+            self._depurar(con)
+        return dataset_id
+
+    def _depurar(self, con):
+        """Borra los conjuntos vencidos y los más antiguos que excedan max_conjuntos"""
+        vencidos = []
+        if self.max_dias is not None:
+            limite = (datetime.now(timezone.utc) - timedelta(days=self.max_dias)).isoformat()
+            vencidos += con.execute('SELECT id FROM datasets WHERE creado < ?', (limite,)).fetchall()
+        if self.max_conjuntos is not None:
+            vencidos += con.execute('SELECT id FROM datasets ORDER BY id DESC LIMIT -1 OFFSET ?',
+                                    (self.max_conjuntos,)).fetchall()
+        for tabla in ('graficas', 'resumenes'):
+            con.executemany(f'DELETE FROM {tabla} WHERE dataset_id = ?', vencidos)
+        con.executemany('DELETE FROM datasets WHERE id = ?', vencidos)
+
+    def listar(self):
+        with closing(self._conectar()) as con:
+            filas = con.execute(
+                'SELECT d.id, d.huella, d.tipo, d.forma, d.creado, COUNT(r.dataset_id) FROM datasets d '
+                'LEFT JOIN resumenes r ON r.dataset_id = d.id GROUP BY d.id ORDER BY d.id DESC').fetchall()
+        return [{
+            'id': id_, 'huella': huella, 'tipo': tipo, 'forma': json.loads(forma),
+            'creado': creado, 'num_analisis': num_analisis
+        } for id_, huella, tipo, forma, creado, num_analisis in filas]
+
+    def obtener(self, dataset_id):
+        """Devuelve la descripción del conjunto y todos sus análisis guardados, o None"""
+        with closing(self._conectar()) as con:
+            fila = con.execute('SELECT huella, tipo, forma, creado FROM datasets WHERE id = ?',
+                               (dataset_id,)).fetchone()
+            if fila is None:
+                return None
+            resumenes = con.execute('SELECT configuracion FROM resumenes WHERE dataset_id = ? ORDER BY creado',
+                                    (dataset_id,)).fetchall()
+
+        analisis = []
+        for (clave,) in resumenes:
+            _, resultado, graficas = self.buscar_resultado(fila[0], json.loads(clave))
+            resultado['graficas'] = graficas
+            analisis.append({'configuracion': json.loads(clave), 'resultado': resultado})
+        return {
+            'id': dataset_id, 'huella': fila[0], 'tipo': fila[1], 'forma': json.loads(fila[2]),
+            'creado': fila[3], 'analisis': analisis
+        }
+
+    def cargar_datos(self, dataset_id):
+        """Devuelve (tipo, arreglos) del conjunto guardado, o None"""
+        with closing(self._conectar()) as con:
+            fila = con.execute('SELECT tipo, datos FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        if fila is None:
+            return None
+        with np.load(io.BytesIO(fila[1]), allow_pickle=False) as archivo:
+            return fila[0], {nombre: archivo[nombre] for nombre in archivo.files}
 
 # Instancia global del analizador
 analizador = AnalisisEstadistico()
 
+# El almacenamiento se activa al indicar ALMACEN_RUTA; consultarlo requiere ALMACEN_TOKEN
+ruta_almacen = os.environ.get('ALMACEN_RUTA', '')
+ALMACEN_TOKEN = os.environ.get('ALMACEN_TOKEN', '')
+almacen = AlmacenAnalisis(
+    ruta_almacen,
+    max_conjuntos=int(os.environ.get('ALMACEN_MAX_CONJUNTOS', 500)),
+    max_dias=float(os.environ.get('ALMACEN_MAX_DIAS', 30)),
+    max_bytes_conjunto=int(float(os.environ.get('ALMACEN_MAX_MB_CONJUNTO', 20)) * 2**20)
+) if ruta_almacen else None
+
+control_admision = ControlAdmision(
+    presupuesto=float(os.environ.get('ADMISION_PRESUPUESTO_MS', 5000)),
+    max_por_cliente=int(os.environ.get('ADMISION_MAX_POR_CLIENTE', 2)),
+    espera_max=float(os.environ.get('ADMISION_ESPERA_MAX', 10)),
+    max_puntos_grafica=MotorClases.MAX_CLASES + analizador.max_puntos_grafica
+)
+
+def identificar_cliente():
+    """Identifica al cliente por su IP; ProxyFix ya la tomó de los proxies confiables"""
+    return request.remote_addr or 'desconocido'
+
+def token_almacen_valido():
+    token = request.headers.get('X-Token-Almacen') or request.args.get('token')
+    return bool(ALMACEN_TOKEN) and token == ALMACEN_TOKEN
+
+def planificar_analisis(data):
+    """Estima el tamaño de la solicitud de /procesar_datos y consulta al control de admisión"""
+    if analizador.es_agrupado:
+        n = n_unicos = len(data.get('clases', []))
+    elif 'conteos' in data:
+        n_unicos = len(data.get('datos', []))
+        n = n_unicos
+    else:
+        datos = np.asarray(data.get('datos', []), dtype=float)
+        n = len(datos)
+        n_unicos = len(pd.unique(datos))
+    return control_admision.planificar(n, n_unicos, num_graficas=2)
+
+# Perfilado bajo demanda: con el encabezado X-Perfilar o el parámetro ?perfilar igual a
+# PERFIL_TOKEN, o para una fracción PERFIL_MUESTREO de las solicitudes
+PERFIL_TOKEN = os.environ.get('PERFIL_TOKEN', '')
+PERFIL_MUESTREO = float(os.environ.get('PERFIL_MUESTREO', 0))
+PERFIL_DIR = os.environ.get('PERFIL_DIR', 'perfiles')
+PERFIL_MAX_ARCHIVOS = int(os.environ.get('PERFIL_MAX_ARCHIVOS', 200))
+
+# cProfile admite un solo perfil activo por proceso (desde Python 3.12 enable() falla si ya hay
+# otro): mientras se perfila una solicitud, las demás se atienden sin perfilar
+candado_perfil = threading.Lock()
+
+def token_perfil_valido():
+    token = request.headers.get('X-Perfilar') or request.args.get('perfilar')
+    return bool(PERFIL_TOKEN) and token == PERFIL_TOKEN
+
+def forma_solicitud(data):
+    """Describe el tamaño de los datos recibidos sin guardar los datos"""
+    forma = {}
+    if not isinstance(data, dict):
+        return forma
+    for clave, valor in data.items():
+        if isinstance(valor, list):
+            forma[clave] = len(valor)
+        elif isinstance(valor, dict):
+            forma[clave] = {'columnas': len(valor), 'filas': max((len(v) for v in valor.values()), default=0)}
+    return forma
+
+def perfilable(vista):
+    """Perfila la vista con cProfile cuando se pide o cuando la solicitud cae en el muestreo"""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        if token_perfil_valido():
+            motivo = 'solicitud'
+        elif PERFIL_MUESTREO > 0 and random.random() < PERFIL_MUESTREO:
+            motivo = 'muestreo'
+        else:
+            return vista(*args, **kwargs)
+
+        if not candado_perfil.acquire(blocking=False):
+            return vista(*args, **kwargs)
+        try:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Otra herramienta de perfilado (o de cobertura) ya está activa
+                return vista(*args, **kwargs)
+
+            inicio = time.perf_counter()
+            try:
+                return vista(*args, **kwargs)
+            finally:
+                perfil.disable()
+                data = request.get_json(silent=True)
+                guardar_perfil(perfil, {
+                    'endpoint': request.path,
+                    'motivo': motivo,
+                    'duracion_s': round(time.perf_counter() - inicio, 4),
+                    'forma': forma_solicitud(data),
+                    'es_agrupado': data.get('es_agrupado', analizador.es_agrupado)
+                                   if isinstance(data, dict) else analizador.es_agrupado,
+                    'creado': datetime.now(timezone.utc).isoformat()
+                })
+        finally:
+            candado_perfil.release()
+    return envoltura
+
+def sin_no_finitos(valor):
+    """Reemplaza NaN e infinitos por None en una estructura JSON, que no los admite"""
+    if isinstance(valor, float):
+        return valor if np.isfinite(valor) else None
+    if isinstance(valor, dict):
+        return {clave: sin_no_finitos(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [sin_no_finitos(v) for v in valor]
+    return valor
+
+def analisis_admitido(vista):
+    """Contrato común de las rutas de análisis con control de admisión.
+
+    La vista recibe el cuerpo JSON y devuelve (resultado, plan) después de consultar a
+    control_admision.planificar. Se ejecuta ocupando el lugar del cliente y con es_muestral y
+    es_agrupado del cuerpo, si vienen en él (ver configuracion_solicitud); la respuesta incluye
+    la decisión de admisión, y una SolicitudRechazada se responde con HTTP 429.
+    """
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        data = request.get_json(silent=True)
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('El cuerpo de la solicitud debe ser un objeto JSON')
+            with control_admision.lugar(identificar_cliente()), analizador.configuracion_solicitud(data):
+                resultado, plan = vista(data, *args, **kwargs)
+            resultado['admision'] = {'decision': plan['decision'], 'costo_estimado': plan['costo_estimado']}
+            return jsonify({'status': 'success', 'resultado': sin_no_finitos(resultado)})
+
+        except SolicitudRechazada as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 429
+
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+    return envoltura
+
+def guardar_perfil(perfil, metadatos):
+    """Escribe el perfil (.prof, formato pstats) y sus metadatos (.json) en PERFIL_DIR"""
+    os.makedirs(PERFIL_DIR, exist_ok=True)
+    nombre = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}_{metadatos['endpoint'].strip('/')}"
+    perfil.dump_stats(os.path.join(PERFIL_DIR, nombre + '.prof'))
+    with open(os.path.join(PERFIL_DIR, nombre + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f)
+
+    # Conservar sólo los PERFIL_MAX_ARCHIVOS perfiles más recientes (los nombres empiezan con la fecha)
+    nombres = sorted({os.path.splitext(archivo)[0] for archivo in os.listdir(PERFIL_DIR)
+                      if archivo.endswith(('.prof', '.json'))})
+    for viejo in nombres[:max(0, len(nombres) - PERFIL_MAX_ARCHIVOS)]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(PERFIL_DIR, viejo + extension))
+            except FileNotFoundError:
+                pass
+
+def listar_perfiles():
+    if not os.path.isdir(PERFIL_DIR):
+        return []
+    perfiles = []
+    for archivo in sorted(os.listdir(PERFIL_DIR), reverse=True):
+        if archivo.endswith('.json'):
+            with open(os.path.join(PERFIL_DIR, archivo), encoding='utf-8') as f:
+                perfiles.append({'nombre': archivo[:-len('.json')], **json.load(f)})
+    return perfiles
+
+def resumir_perfiles(nombres, top=20, filtro=None, orden='cumulative'):
+    """Suma los perfiles indicados y devuelve sus funciones más costosas.
+
+    filtro limita a funciones cuyo archivo contiene ese texto (ej. 'app.py' o 'matplotlib').
+    """
+    rutas = [os.path.join(PERFIL_DIR, os.path.basename(nombre) + '.prof') for nombre in nombres]
+    rutas = [ruta for ruta in rutas if os.path.exists(ruta)]
+    if not rutas:
+        return []
+    estadisticas = pstats.Stats(*rutas)
+
+    columna = {'cumulative': 3, 'tottime': 2, 'calls': 1}[orden]
+    filas = [(archivo, linea, funcion, datos) for (archivo, linea, funcion), datos in estadisticas.stats.items()
+             if not filtro or filtro in archivo]
+    filas.sort(key=lambda fila: fila[3][columna], reverse=True)
+    return [{
+        'funcion': f'{os.path.basename(archivo)}:{linea}({funcion})',
+        'llamadas': llamadas,
+        'tiempo_propio_s': round(tiempo_propio, 4),
+        'tiempo_acumulado_s': round(tiempo_acumulado, 4)
+    } for archivo, linea, funcion, (_, llamadas, tiempo_propio, tiempo_acumulado, _) in filas[:top]]
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -265,72 +1567,428 @@ def configurar():
     
     return jsonify({'status': 'success', 'message': 'Configuración guardada'})
 
-@app.route('/procesar_datos', methods=['POST'])
-def procesar_datos():
-    data = request.get_json()
-    
-    try:
-        if analizador.es_agrupado:
-            # Datos agrupados
-            clases = data.get('clases', [])
-            frecuencias = data.get('frecuencias', [])
-            frecuencias = [int(f) for f in frecuencias]
-            
-            analizador.clases = clases
-            analizador.frecuencias = frecuencias
-            
-            # Calcular estadísticas
-            estadisticas = analizador.calcular_estadisticas_agrupadas(clases, frecuencias)
-            
-            # Generar gráficas
-            graficas = analizador.generar_graficas([], tipo='agrupado', clases=clases, frecuencias=frecuencias)
-            
-            # Calcular parámetros adicionales
-            valor_max = float(max([float(clase.split('-')[1]) for clase in clases if '-' in clase]))
-            valor_min = float(min([float(clase.split('-')[0]) for clase in clases if '-' in clase]))
-            rango = float(valor_max - valor_min)
-            num_clases = int(len(clases))
-            amplitud = float(rango / num_clases if num_clases > 0 else 0)
-            
-            resultado = {
-                'tipo': 'agrupado',
-                'estadisticas': estadisticas,
-                'graficas': graficas,
-                'parametros_adicionales': {
-                    'valor_maximo': round(valor_max, 4),
-                    'valor_minimo': round(valor_min, 4),
-                    'rango': round(rango, 4),
-                    'num_clases': num_clases,
-                    'amplitud': round(amplitud, 4)
-                }
-            }
-            
-        else:
-            # Datos desagrupados
-            datos_raw = data.get('datos', [])
-            datos = [float(d) for d in datos_raw]
-            analizador.datos = datos
-            
-            # Calcular estadísticas
-            estadisticas = analizador.calcular_estadisticas_basicas(datos)
-            
-            # Crear tabla de frecuencias
-            tabla_frecuencias = analizador.crear_tabla_frecuencias(datos)
-            
-            # Generar gráficas
-            graficas = analizador.generar_graficas(datos, tipo='desagrupado')
-            
-            resultado = {
-                'tipo': 'desagrupado',
-                'estadisticas': estadisticas,
-                'tabla_frecuencias': tabla_frecuencias,
-                'graficas': graficas
-            }
+def secciones_analisis(data, dpi=300, max_filas_tabla=None):
+    """Genera el análisis por secciones, de la más barata a la más costosa.
+
+    Produce pares (seccion, contenido); las gráficas llegan como ('graficas', (nombre, valor))
+    conforme se dibujan, para que las respuestas progresivas las envíen de inmediato.
+    dpi y max_filas_tabla permiten al control de admisión degradar la respuesta.
+    """
+    if analizador.es_agrupado:
+        # Datos agrupados
+        clases = data.get('clases', [])
+        frecuencias = data.get('frecuencias', [])
+        frecuencias = [int(f) for f in frecuencias]
+        
+        analizador.clases = clases
+        analizador.frecuencias = frecuencias
         
-        return jsonify({'status': 'success', 'resultado': resultado})
+        # Calcular estadísticas
+        estadisticas = analizador.calcular_estadisticas_agrupadas(clases, frecuencias)
+        
+        # Calcular parámetros adicionales
+        limites = [limites_clase(clase) for clase in clases]
+        valor_max = float(max([superior for _, superior in filter(None, limites)]))
+        valor_min = float(min([inferior for inferior, _ in filter(None, limites)]))
+        rango = float(valor_max - valor_min)
+        num_clases = int(len(clases))
+        amplitud = float(rango / num_clases if num_clases > 0 else 0)
+        
+        yield 'tipo', 'agrupado'
+        yield 'estadisticas', estadisticas
+        yield 'parametros_adicionales', {
+            'valor_maximo': round(valor_max, 4),
+            'valor_minimo': round(valor_min, 4),
+            'rango': round(rango, 4),
+            'num_clases': num_clases,
+            'amplitud': round(amplitud, 4)
+        }
         
+        # Generar gráficas
+        graficas = analizador.iterar_graficas([], tipo='agrupado', clases=clases, frecuencias=frecuencias, dpi=dpi)
+        
+    elif 'conteos' in data:
+        # Datos desagrupados como pares (valor, conteo), sin expandir
+        valores, conteos = analizador._preparar_ponderados(data.get('datos', []), data.get('conteos', []))
+        analizador.datos = valores.tolist()
+        analizador.conteos = conteos.tolist()
+        
+        yield 'tipo', 'desagrupado'
+        yield 'estadisticas', analizador.calcular_estadisticas_ponderadas(valores, conteos)
+        yield 'tabla_frecuencias', analizador.crear_tabla_frecuencias_ponderada(valores, conteos,
+                                                                              max_filas=max_filas_tabla)
+        graficas = analizador.iterar_graficas(valores, tipo='desagrupado', conteos=conteos, dpi=dpi)
+        
+    else:
+        # Datos desagrupados
+        datos_raw = data.get('datos', [])
+        datos = [float(d) for d in datos_raw]
+        analizador.datos = datos
+        analizador.conteos = []
+        
+        yield 'tipo', 'desagrupado'
+        
+        # Calcular estadísticas
+        yield 'estadisticas', analizador.calcular_estadisticas_basicas(datos)
+        
+        # Crear tabla de frecuencias
+        yield 'tabla_frecuencias', analizador.crear_tabla_frecuencias(datos, max_filas=max_filas_tabla)
+        
+        # Generar gráficas
+        graficas = analizador.iterar_graficas(datos, tipo='desagrupado', dpi=dpi)
+    
+    for nombre, valor in graficas:
+        if nombre in analizador.SECCIONES_NO_GRAFICAS:
+            yield nombre, valor
+        else:
+            yield 'graficas', (nombre, valor)
+
+def paquete_datos(data):
+    """Normaliza los datos de la solicitud a (tipo, arreglos) para identificarlos y guardarlos"""
+    if analizador.es_agrupado:
+        return 'agrupado', {
+            'clases': np.array(data.get('clases', []), dtype=str),
+            'frecuencias': np.array([int(f) for f in data.get('frecuencias', [])], dtype=np.int64)
+        }
+    elif 'conteos' in data:
+        valores, conteos = analizador._preparar_ponderados(data.get('datos', []), data.get('conteos', []))
+        return 'ponderado', {'valores': valores, 'conteos': conteos}
+    else:
+        return 'desagrupado', {'datos': np.asarray(data.get('datos', []), dtype=float)}
+
+# Versión del formato y las fórmulas de los resultados; forma parte de la clave de los análisis
+# guardados, así que hay que incrementarla al cambiar secciones, campos o cálculos
+VERSION_RESULTADOS = 2
+
+# Orden en el que se entregan las secciones de un análisis guardado
+SECCIONES_GUARDADAS = ('tipo', 'estadisticas', 'parametros_adicionales', 'tabla_frecuencias', 'atipicos',
+                       'muestreo')
+
+def secciones_con_almacen(data, opciones):
+    """Como secciones_analisis, pero reutiliza el análisis guardado del mismo conjunto y configuración.
+
+    Si no existe, lo calcula, lo guarda al terminar y, si se guardó, al final entrega ('dataset_id', id).
+    """
+    if almacen is None:
+        yield from secciones_analisis(data, **opciones)
+        return
+
+    tipo, arreglos = paquete_datos(data)
+    huella = almacen.huella(tipo, arreglos)
+    configuracion = {'version': VERSION_RESULTADOS, 'es_muestral': bool(analizador.es_muestral), **opciones}
+
+    guardado = almacen.buscar_resultado(huella, configuracion)
+    if guardado is not None:
+        dataset_id, resultado, graficas = guardado
+        for seccion in SECCIONES_GUARDADAS:
+            if seccion in resultado:
+                yield seccion, resultado[seccion]
+        for nombre, valor in graficas.items():
+            yield 'graficas', (nombre, valor)
+        yield 'dataset_id', dataset_id
+        return
+
+    resultado = {}
+    graficas = {}
+    for seccion, contenido in secciones_analisis(data, **opciones):
+        if seccion == 'graficas':
+            nombre, valor = contenido
+            graficas[nombre] = valor
+        else:
+            resultado[seccion] = contenido
+        yield seccion, contenido
+
+    dataset_id = almacen.guardar(huella, tipo, arreglos, configuracion, resultado, graficas)
+    if dataset_id is not None:
+        yield 'dataset_id', dataset_id
+
+@app.route('/procesar_datos', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_datos(data):
+    plan = planificar_analisis(data)
+    resultado = {'graficas': {}}
+    for seccion, contenido in secciones_con_almacen(data, plan['opciones']):
+        if seccion == 'graficas':
+            nombre, valor = contenido
+            resultado['graficas'][nombre] = valor
+        else:
+            resultado[seccion] = contenido
+    return resultado, plan
+
+@app.route('/procesar_datos_stream', methods=['POST'])
+def procesar_datos_stream():
+    """Igual que /procesar_datos, pero envía cada sección como una línea JSON (NDJSON) al estar lista"""
+    data = request.get_json(silent=True)
+    cliente = identificar_cliente()
+
+    def evento(**campos):
+        return json.dumps(sin_no_finitos(campos), allow_nan=False) + '\n'
+
+    try:
+        if not isinstance(data, dict):
+            raise ValueError('El cuerpo de la solicitud debe ser un objeto JSON')
+        tam_pagina = max(1, int(data.get('tam_pagina', 200)))
+    except Exception as e:
+        return Response(evento(evento='error', message=str(e)), mimetype='application/x-ndjson')
+
+    # El lugar del cliente se ocupa aquí y se libera cuando termina de enviarse la respuesta
+    try:
+        control_admision.ocupar(cliente)
+    except SolicitudRechazada as e:
+        return Response(evento(evento='error', message=str(e)), status=429, mimetype='application/x-ndjson')
+
+    try:
+        with analizador.configuracion_solicitud(data):
+            plan = planificar_analisis(data)
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)})
+        control_admision.liberar(cliente)
+        status = 429 if isinstance(e, SolicitudRechazada) else 200
+        return Response(evento(evento='error', message=str(e)), status=status, mimetype='application/x-ndjson')
+
+    def generar():
+        try:
+            yield evento(evento='admision', datos={'decision': plan['decision'],
+                                                   'costo_estimado': plan['costo_estimado']})
+            # La respuesta se recorre en el mismo hilo que atendió la solicitud
+            with analizador.configuracion_solicitud(data):
+                for seccion, contenido in secciones_con_almacen(data, plan['opciones']):
+                    if seccion == 'tabla_frecuencias':
+                        # La tabla se envía en páginas para no retrasar las gráficas
+                        total = len(contenido)
+                        for inicio in range(0, total, tam_pagina):
+                            yield evento(evento='tabla_frecuencias', pagina=inicio // tam_pagina,
+                                         total=total, filas=contenido[inicio:inicio + tam_pagina])
+                    elif seccion == 'graficas':
+                        nombre, valor = contenido
+                        yield evento(evento='grafica', nombre=nombre, valor=valor)
+                    else:
+                        yield evento(evento=seccion, datos=contenido)
+            yield evento(evento='fin')
+
+        except Exception as e:
+            yield evento(evento='error', message=str(e))
+
+    respuesta = Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+    respuesta.call_on_close(lambda: control_admision.liberar(cliente))
+    return respuesta
+
+@app.route('/procesar_tabla', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_tabla(data):
+    # Tabla como {columna: [datos]}; las gráficas sólo para las columnas pedidas
+    tabla = data.get('tabla', {})
+    columnas_graficas = data.get('graficas', [])
+
+    n_filas = max((len(columna) for columna in tabla.values()), default=0)
+    plan = control_admision.planificar(n_filas * len(tabla), 0, num_graficas=2 * len(columnas_graficas))
+    dpi = plan['opciones'].get('dpi', 300)
+
+    resultado = analizador.calcular_estadisticas_tabla(tabla)
+    resultado['tipo'] = 'tabla'
+
+    graficas = {}
+    atipicos = {}
+    for columna in columnas_graficas:
+        if columna not in tabla:
+            raise ValueError(f'La columna {columna} no existe en la tabla')
+        datos = [float(d) for d in tabla[columna]]
+        graficas[columna] = {}
+        for nombre, valor in analizador.iterar_graficas(datos, tipo='desagrupado', dpi=dpi):
+            if nombre == 'atipicos':
+                atipicos[columna] = valor
+            elif nombre not in analizador.SECCIONES_NO_GRAFICAS:
+                graficas[columna][nombre] = valor
+    resultado['graficas'] = graficas
+    resultado['atipicos'] = atipicos
+    return resultado, plan
+
+@app.route('/agrupar_datos', methods=['POST'])
+@perfilable
+@analisis_admitido
+def agrupar_datos(data):
+    """Agrupa datos desagrupados en clases y calcula el análisis de datos agrupados"""
+    if 'conteos' in data:
+        datos, conteos = analizador._preparar_ponderados(data.get('datos', []), data.get('conteos', []))
+    else:
+        datos, conteos = np.asarray(data.get('datos', []), dtype=float), None
+    plan = control_admision.planificar(len(datos), 0, num_graficas=2)
+
+    agrupacion = analizador.motor_clases.agrupar(
+        datos, conteos,
+        estrategia=data.get('estrategia', 'sturges'),
+        num_clases=data.get('num_clases'),
+        ancho=data.get('ancho')
+    )
+    clases = agrupacion['clases']
+    frecuencias = [int(f) for f in agrupacion['frecuencias']]
+
+    resultado = {
+        'tipo': 'agrupado',
+        'estrategia': agrupacion['estrategia'],
+        'clases': clases,
+        'frecuencias': frecuencias,
+        'bordes': [float(b) for b in agrupacion['bordes']],
+        'estadisticas': analizador.calcular_estadisticas_agrupadas(clases, frecuencias,
+                                                                   bordes=agrupacion['bordes'])
+    }
+    if data.get('graficas', True):
+        resultado['graficas'] = analizador.generar_graficas([], tipo='agrupado', clases=clases,
+                                                            frecuencias=frecuencias,
+                                                            dpi=plan['opciones'].get('dpi', 300))
+    return resultado, plan
+
+@app.route('/procesar_ventanas', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_ventanas(data):
+    datos = np.asarray(data.get('datos', []), dtype=float)
+    ventana = int(data.get('ventana', 0))
+    # 'deslizante' avanza de a `paso` datos (1 por omisión); 'fija' no traslapa ventanas
+    tipo = data.get('tipo', 'deslizante')
+    if tipo not in ('deslizante', 'fija'):
+        raise ValueError(f'Tipo de ventana desconocido: {tipo}')
+    paso = ventana if tipo == 'fija' else int(data.get('paso', 1))
+
+    plan = control_admision.planificar(len(datos), 0, num_graficas=1 if data.get('grafica') else 0)
+
+    resultado = analizador.calcular_estadisticas_moviles(datos, ventana, paso)
+    resultado['tipo'] = tipo
+    if data.get('grafica'):
+        resultado['grafica_tendencia'] = analizador.generar_grafica_tendencia(
+            datos, resultado, dpi=plan['opciones'].get('dpi', 300))
+    return resultado, plan
+
+@app.route('/procesar_bootstrap', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_bootstrap(data):
+    datos = data.get('datos', [])
+    conteos = data.get('conteos')
+    # El límite se verifica antes de planificar: una solicitud fuera de él se rechaza, no se degrada
+    remuestras = analizador.validar_remuestras(data.get('remuestras', 1000))
+    nivel = float(data.get('nivel', 0.95))
+    semilla = int(data.get('semilla', 0))
+
+    # Con conteos, cada remuestra cuesta como un vector del tamaño de los valores únicos
+    plan = control_admision.planificar(len(datos), 0, num_graficas=0, remuestras=remuestras)
+
+    # En modo degradado se usan menos remuestras; la respuesta informa cuántas se pidieron
+    remuestras_usadas = plan['opciones'].get('remuestras', remuestras)
+    resultado = analizador.calcular_intervalos_bootstrap(datos, conteos, remuestras=remuestras_usadas,
+                                                         nivel=nivel, semilla=semilla)
+    resultado['remuestras_solicitadas'] = remuestras
+    return resultado, plan
+
+@app.route('/procesar_lote_agrupado', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_lote_agrupado(data):
+    # frecuencias: una fila por tabla; bordes comunes, una fila de bordes por tabla, o clases "min-max"
+    frecuencias = np.asarray(data.get('frecuencias', []), dtype=float)
+    if frecuencias.ndim != 2 or frecuencias.size == 0:
+        raise ValueError('Las frecuencias deben ser una lista de tablas con el mismo número de clases')
+    puntos_medios = None
+    if 'bordes' in data:
+        bordes = np.asarray(data['bordes'], dtype=float)
+    else:
+        clases = data.get('clases', [])
+        if len(clases) != frecuencias.shape[1]:
+            raise ValueError('Debe haber una frecuencia por clase en cada tabla')
+        orden, bordes, puntos_medios = analizador.preparar_clases(clases)
+        frecuencias = frecuencias[:, orden]
+
+    plan = control_admision.planificar(frecuencias.size, 0, num_graficas=0)
+
+    lote = analizador.calcular_estadisticas_agrupadas_lote(bordes, frecuencias, puntos_medios)
+    vacias = lote['n'] == 0
+    resultado = {nombre: analizador._redondear_columna(arreglo) for nombre, arreglo in lote.items()
+                 if nombre not in ('n', 'clase_mediana', 'clase_modal')}
+    resultado['n'] = lote['n'].astype(np.int64).tolist()
+    # Índices de clase con None en las tablas vacías, como las demás estadísticas
+    for nombre in ('clase_mediana', 'clase_modal'):
+        resultado[nombre] = [None if vacia else int(i) for i, vacia in zip(lote[nombre], vacias)]
+    resultado['num_tablas'] = int(frecuencias.shape[0])
+    return resultado, plan
+
+@app.route('/procesar_atipicos', methods=['POST'])
+@perfilable
+@analisis_admitido
+def procesar_atipicos(data):
+    datos = data.get('datos', [])
+    conteos = data.get('conteos')
+    if conteos is not None:
+        valores, conteos = analizador._preparar_ponderados(datos, conteos)
+    else:
+        valores = np.asarray(datos, dtype=float)
+        if len(valores) == 0:
+            raise ValueError('No hay datos para analizar')
+
+    plan = control_admision.planificar(len(valores), 0, num_graficas=0)
+
+    resultado = analizador.detectar_atipicos(
+        valores, conteos,
+        umbral_z=float(data.get('umbral_z', 3.0)),
+        umbral_mad=float(data.get('umbral_mad', 3.5)),
+        pagina=int(data.get('pagina', 0)),
+        tam_pagina=max(1, int(data.get('tam_pagina', 100))))
+    return resultado, plan
+
+@app.route('/analisis')
+def listar_analisis():
+    if not token_almacen_valido():
+        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+    if almacen is None:
+        return jsonify({'status': 'error', 'message': 'El almacenamiento está desactivado'}), 404
+    return jsonify({'status': 'success', 'datasets': almacen.listar()})
+
+@app.route('/analisis/<int:dataset_id>')
+def obtener_analisis(dataset_id):
+    if not token_almacen_valido():
+        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+    dataset = almacen.obtener(dataset_id) if almacen is not None else None
+    if dataset is None:
+        return jsonify({'status': 'error', 'message': 'No existe el conjunto de datos'}), 404
+    return jsonify({'status': 'success', 'dataset': dataset})
+
+@app.route('/analisis/<int:dataset_id>/datos')
+def obtener_datos_analisis(dataset_id):
+    if not token_almacen_valido():
+        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+    guardado = almacen.cargar_datos(dataset_id) if almacen is not None else None
+    if guardado is None:
+        return jsonify({'status': 'error', 'message': 'No existe el conjunto de datos'}), 404
+    tipo, arreglos = guardado
+    return jsonify({'status': 'success', 'tipo': tipo,
+                    'datos': {nombre: arreglo.tolist() for nombre, arreglo in arreglos.items()}})
+
+@app.route('/perfiles')
+def perfiles():
+    """Lista los perfiles guardados y resume sus funciones más costosas (requiere PERFIL_TOKEN)"""
+    if not token_perfil_valido():
+        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+
+    lista = listar_perfiles()
+    nombres = request.args.get('nombres')
+    nombres = nombres.split(',') if nombres else [perfil['nombre'] for perfil in lista]
+    top = request.args.get('top', '20')
+    if not top.isdigit() or int(top) < 1:
+        return jsonify({'status': 'error', 'message': f'top debe ser un entero positivo: {top}'}), 400
+    top = int(top)
+    orden = request.args.get('orden', 'cumulative')
+    if orden not in ('cumulative', 'tottime', 'calls'):
+        return jsonify({'status': 'error', 'message': f'Orden desconocido: {orden}'}), 400
+
+    return jsonify({
+        'status': 'success',
+        'perfiles': lista,
+        'funciones': resumir_perfiles(nombres, top=top, filtro=request.args.get('filtro'), orden=orden)
+    })
+
+@app.route('/metricas_admision')
+def metricas_admision():
+    return jsonify(control_admision.resumen())
 
 # Template HTML
 html_template = """
@@ -790,8 +2448,8 @@ html_template = """
                     body: JSON.stringify(datosParaEnviar)
                 });
                 
-                // Procesar datos
-                const response = await fetch('/procesar_datos', {
+                // Procesar datos: cada sección se muestra en cuanto llega
+                const response = await fetch('/procesar_datos_stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
@@ -799,12 +2457,24 @@ html_template = """
                     body: JSON.stringify(datosParaEnviar)
                 });
                 
-                const result = await response.json();
+                iniciarResultados();
+                const lector = response.body.getReader();
+                const decodificador = new TextDecoder();
+                let pendiente = '';
                 
-                if (result.status === 'success') {
-                    mostrarResultados(result.resultado);
-                } else {
-                    throw new Error(result.message);
+                while (true) {
+                    const { done, value } = await lector.read();
+                    if (done) break;
+                    
+                    pendiente += decodificador.decode(value, { stream: true });
+                    const lineas = pendiente.split('\\n');
+                    pendiente = lineas.pop();
+                    
+                    for (const linea of lineas) {
+                        if (linea.trim()) {
+                            procesarEvento(JSON.parse(linea));
+                        }
+                    }
                 }
                 
             } catch (error) {
@@ -819,12 +2489,50 @@ html_template = """
             }
         }
 
-        function mostrarResultados(resultado) {
-            let html = '';
-            
-            // Mostrar estadísticas
-            html += '<div class="stats-grid">';
-            for (const [key, value] of Object.entries(resultado.estadisticas)) {
+        function iniciarResultados() {
+            document.getElementById('contenido-resultados').innerHTML = `
+                <div id="seccion-admision"></div>
+                <div id="seccion-estadisticas"></div>
+                <div id="seccion-parametros"></div>
+                <div id="seccion-tabla"></div>
+                <div id="seccion-graficas"></div>
+                <div id="seccion-sesgo"></div>
+            `;
+            document.getElementById('resultados').classList.remove('hidden');
+        }
+
+        function procesarEvento(evento) {
+            switch (evento.evento) {
+                case 'admision':
+                    if (evento.datos.decision === 'degradada') {
+                        document.getElementById('seccion-admision').innerHTML = `
+                            <div class="alert alert-error">
+                                Por el tamaño de los datos, las gráficas se generan en menor resolución y la tabla de frecuencias se agrupa en intervalos.
+                            </div>
+                        `;
+                    }
+                    break;
+                case 'estadisticas':
+                    document.getElementById('seccion-estadisticas').innerHTML = htmlValores(evento.datos);
+                    break;
+                case 'parametros_adicionales':
+                    document.getElementById('seccion-parametros').innerHTML =
+                        '<h3>📏 Parámetros de Agrupación</h3>' + htmlValores(evento.datos);
+                    break;
+                case 'tabla_frecuencias':
+                    agregarFilasTabla(evento.filas);
+                    break;
+                case 'grafica':
+                    agregarGrafica(evento.nombre, evento.valor);
+                    break;
+                case 'error':
+                    throw new Error(evento.message);
+            }
+        }
+
+        function htmlValores(valores) {
+            let html = '<div class="stats-grid">';
+            for (const [key, value] of Object.entries(valores)) {
                 const label = traducirLabel(key);
                 html += `
                     <div class="stat-item">
@@ -834,92 +2542,73 @@ html_template = """
                 `;
             }
             html += '</div>';
-            
-            // Parámetros adicionales para datos agrupados
-            if (resultado.parametros_adicionales) {
-                html += '<h3>📏 Parámetros de Agrupación</h3>';
-                html += '<div class="stats-grid">';
-                for (const [key, value] of Object.entries(resultado.parametros_adicionales)) {
-                    const label = traducirLabel(key);
-                    html += `
-                        <div class="stat-item">
-                            <div class="stat-label">${label}</div>
-                            <div class="stat-value">${value}</div>
-                        </div>
-                    `;
-                }
-                html += '</div>';
+            return html;
+        }
+
+        // Tabla de frecuencias para datos desagrupados, llega por páginas
+        function agregarFilasTabla(filas) {
+            const seccion = document.getElementById('seccion-tabla');
+            if (!seccion.innerHTML) {
+                seccion.innerHTML = `
+                    <h3>📊 Tabla de Frecuencias</h3>
+                    <div class="table-container">
+                        <table>
+                            <thead>
+                                <tr>
+                                    <th>Valor</th>
+                                    <th>Frecuencia</th>
+                                    <th>Frecuencia Relativa</th>
+                                    <th>Frecuencia Acumulada</th>
+                                    <th>Frecuencia Relativa Acumulada</th>
+                                </tr>
+                            </thead>
+                            <tbody id="filas-frecuencias"></tbody>
+                        </table>
+                    </div>
+                `;
             }
             
-            // Tabla de frecuencias para datos desagrupados
-            if (resultado.tabla_frecuencias) {
-                html += '<h3>📊 Tabla de Frecuencias</h3>';
-                html += '<div class="table-container">';
-                html += '<table>';
+            let html = '';
+            filas.forEach(fila => {
                 html += `
-                    <thead>
-                        <tr>
-                            <th>Valor</th>
-                            <th>Frecuencia</th>
-                            <th>Frecuencia Relativa</th>
-                            <th>Frecuencia Acumulada</th>
-                            <th>Frecuencia Relativa Acumulada</th>
-                        </tr>
-                    </thead>
-                    <tbody>
+                    <tr>
+                        <td>${fila.valor}</td>
+                        <td>${fila.frecuencia}</td>
+                        <td>${fila.frecuencia_relativa}</td>
+                        <td>${fila.frecuencia_acumulada}</td>
+                        <td>${fila.frecuencia_relativa_acumulada}</td>
+                    </tr>
                 `;
-                
-                resultado.tabla_frecuencias.forEach(fila => {
-                    html += `
-                        <tr>
-                            <td>${fila.valor}</td>
-                            <td>${fila.frecuencia}</td>
-                            <td>${fila.frecuencia_relativa}</td>
-                            <td>${fila.frecuencia_acumulada}</td>
-                            <td>${fila.frecuencia_relativa_acumulada}</td>
-                        </tr>
-                    `;
-                });
-                
-                html += '</tbody></table></div>';
+            });
+            document.getElementById('filas-frecuencias').insertAdjacentHTML('beforeend', html);
+        }
+
+        // Gráficas
+        function agregarGrafica(nombre, valor) {
+            if (nombre === 'sesgo_visual') {
+                document.getElementById('seccion-sesgo').innerHTML = `
+                    <div class="alert alert-success">
+                        <strong>Análisis de Sesgo Visual:</strong> La distribución está sesgada hacia la ${valor}
+                    </div>
+                `;
+                return;
             }
             
-            // Gráficas
-            if (resultado.graficas) {
-                html += '<h3>📈 Gráficas</h3>';
-                
-                if (resultado.graficas.histograma) {
-                    html += '<div class="chart-container">';
-                    html += '<h4>Histograma</h4>';
-                    html += `<img src="data:image/png;base64,${resultado.graficas.histograma}" alt="Histograma">`;
-                    html += '</div>';
-                }
-                
-                if (resultado.graficas.boxplot) {
-                    html += '<div class="chart-container">';
-                    html += '<h4>Diagrama de Caja y Bigotes</h4>';
-                    html += `<img src="data:image/png;base64,${resultado.graficas.boxplot}" alt="Boxplot">`;
-                    html += '</div>';
-                }
-                
-                if (resultado.graficas.grafica_xr) {
-                    html += '<div class="chart-container">';
-                    html += '<h4>Gráfica X-R (Promedios y Rangos)</h4>';
-                    html += `<img src="data:image/png;base64,${resultado.graficas.grafica_xr}" alt="Gráfica X-R">`;
-                    html += '</div>';
-                }
-                
-                if (resultado.graficas.sesgo_visual) {
-                    html += `
-                        <div class="alert alert-success">
-                            <strong>Análisis de Sesgo Visual:</strong> La distribución está sesgada hacia la ${resultado.graficas.sesgo_visual}
-                        </div>
-                    `;
-                }
+            const titulos = {
+                'histograma': 'Histograma',
+                'boxplot': 'Diagrama de Caja y Bigotes',
+                'grafica_xr': 'Gráfica X-R (Promedios y Rangos)'
+            };
+            const seccion = document.getElementById('seccion-graficas');
+            if (!seccion.innerHTML) {
+                seccion.innerHTML = '<h3>📈 Gráficas</h3>';
             }
-            
-            document.getElementById('contenido-resultados').innerHTML = html;
-            document.getElementById('resultados').classList.remove('hidden');
+            seccion.insertAdjacentHTML('beforeend', `
+                <div class="chart-container">
+                    <h4>${titulos[nombre] || nombre}</h4>
+                    <img src="data:image/png;base64,${valor}" alt="${titulos[nombre] || nombre}">
+                </div>
+            `);
         }
 
         function traducirLabel(key) {
@@ -935,6 +2624,9 @@ html_template = """
                 'sesgo': 'Sesgo',
                 'curtosis': 'Curtosis',
                 'mediana_aproximada': 'Mediana Aproximada',
+                'cuartil_1': 'Primer Cuartil',
+                'cuartil_3': 'Tercer Cuartil',
+                'moda_agrupada': 'Moda (Fórmula Agrupada)',
                 'num_clases': 'Número de Clases',
                 'amplitud': 'Amplitud de Clase'
             };
@@ -955,7 +2647,6 @@ html_template = """
 """
 
 # Crear directorio de templates si no existe
-import os
 if not os.path.exists('templates'):
     os.makedirs('templates')
 
@@ -964,6 +2655,15 @@ with open('templates/index.html', 'w', encoding='utf-8') as f:
     f.write(html_template.strip())
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['perfiles']:
+        # python app.py perfiles [filtro] : funciones más costosas de todos los perfiles guardados
+        filtro = sys.argv[2] if len(sys.argv) > 2 else None
+        lista = listar_perfiles()
+        print(f'{len(lista)} perfiles en {PERFIL_DIR}')
+        for fila in resumir_perfiles([perfil['nombre'] for perfil in lista], filtro=filtro):
+            print(f"{fila['tiempo_acumulado_s']:>10.4f} s {fila['tiempo_propio_s']:>10.4f} s "
+                  f"{fila['llamadas']:>9}  {fila['funcion']}")
+        sys.exit(0)
     #port = int(os.environ.get("PORT", 5000))
     #app.run(host="0.0.0.0", port=port)
     app.run()
\ No newline at end of file
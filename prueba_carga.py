@@ -0,0 +1,333 @@
+"""Generador de carga para el servidor de análisis estadístico.
+
+Levanta gunicorn localmente (o usa un servidor ya iniciado con --url) y simula usuarios
+concurrentes que envían una mezcla configurable de análisis de distintos tamaños. Al terminar
+reporta rendimiento, latencias p50/p95/p99, tasa de errores y memoria (RSS) de los workers.
+
+Ejemplos:
+    python prueba_carga.py --workers 2 --threads 4 --usuarios 8 --duracion 60
+    python prueba_carga.py --mezcla desagrupado:5,agrupado:2,ventanas:1 --tamanos 1000,100000
+    python prueba_carga.py --url http://127.0.0.1:8000 --json resultados.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Escenarios disponibles: cada uno arma la lista de (endpoint, cuerpo) de una solicitud de usuario
+def escenario_desagrupado(rng, n):
+    datos = [round(rng.gauss(50, 10), 2) for _ in range(n)]
+    return [('/configurar', {'es_muestral': True, 'es_agrupado': False}),
+            ('/procesar_datos', {'es_muestral': True, 'es_agrupado': False, 'datos': datos})]
+
+def escenario_ponderado(rng, n):
+    # Lecturas enteras muy repetidas: pocos valores distintos con conteos grandes
+    valores = list(range(min(n, 300)))
+    conteos = [rng.randint(1, max(1, 2 * n // len(valores))) for _ in valores]
+    return [('/configurar', {'es_muestral': True, 'es_agrupado': False}),
+            ('/procesar_datos', {'es_muestral': True, 'es_agrupado': False,
+                                 'datos': valores, 'conteos': conteos})]
+
+def escenario_agrupado(rng, n):
+    num_clases = max(3, min(20, n // 100))
+    clases = [f'{10 * i}-{10 * (i + 1)}' for i in range(num_clases)]
+    frecuencias = [rng.randint(1, max(1, n // num_clases)) for _ in clases]
+    return [('/configurar', {'es_muestral': False, 'es_agrupado': True}),
+            ('/procesar_datos', {'es_muestral': False, 'es_agrupado': True,
+                                 'clases': clases, 'frecuencias': frecuencias})]
+
+def escenario_stream(rng, n):
+    datos = [round(rng.gauss(50, 10), 2) for _ in range(n)]
+    return [('/procesar_datos_stream', {'es_muestral': True, 'es_agrupado': False, 'datos': datos})]
+
+def escenario_tabla(rng, n):
+    filas = max(10, n // 10)
+    tabla = {f'col{j}': [round(rng.gauss(j, 1), 3) for _ in range(filas)] for j in range(10)}
+    return [('/procesar_tabla', {'tabla': tabla, 'graficas': ['col0']})]
+
+def escenario_agrupar(rng, n):
+    datos = [round(rng.expovariate(0.1), 2) for _ in range(n)]
+    return [('/agrupar_datos', {'datos': datos, 'estrategia': 'freedman_diaconis'})]
+
+def escenario_ventanas(rng, n):
+    datos = [round(100 + 0.01 * i + rng.gauss(0, 1), 3) for i in range(n)]
+    return [('/procesar_ventanas', {'datos': datos, 'ventana': max(2, n // 50), 'grafica': True})]
+
+ESCENARIOS = {
+    'desagrupado': escenario_desagrupado,
+    'ponderado': escenario_ponderado,
+    'agrupado': escenario_agrupado,
+    'stream': escenario_stream,
+    'tabla': escenario_tabla,
+    'agrupar': escenario_agrupar,
+    'ventanas': escenario_ventanas,
+}
+
+
+def leer_mezcla(texto):
+    """Convierte "desagrupado:6,agrupado:2" en una lista de (escenario, peso)"""
+    mezcla = []
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition(':')
+        if nombre not in ESCENARIOS:
+            raise ValueError(f'Escenario desconocido: {nombre} (disponibles: {", ".join(ESCENARIOS)})')
+        mezcla.append((nombre, float(peso or 1)))
+    return mezcla
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_gunicorn(args, puerto):
+    """Inicia gunicorn con la configuración indicada y espera a que responda"""
+    entorno = dict(os.environ)
+    if not args.con_almacen:
+        # Sin almacén persistente cada solicitud repetida se recalcula
+        entorno['ALMACEN_RUTA'] = ''
+    else:
+        entorno.setdefault('ALMACEN_RUTA', os.path.join(tempfile.mkdtemp(), 'carga.db'))
+
+    comando = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{puerto}',
+               '--workers', str(args.workers), '--threads', str(args.threads),
+               '--timeout', str(args.timeout)] + args.gunicorn_extra
+    proceso = subprocess.Popen(comando, cwd=os.path.dirname(os.path.abspath(__file__)), env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    limite = time.time() + 30
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError('gunicorn terminó al iniciar; revisa que esté instalado')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{puerto}/metricas_admision', timeout=1)
+            return proceso
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError('gunicorn no respondió en 30 segundos')
+
+def rss_workers(pid_maestro):
+    """RSS en MB de cada worker (hijos del proceso maestro), leído de /proc"""
+    rss = {}
+    try:
+        with open(f'/proc/{pid_maestro}/task/{pid_maestro}/children') as f:
+            hijos = [int(p) for p in f.read().split()]
+    except OSError:
+        return rss
+    for pid in hijos:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for linea in f:
+                    if linea.startswith('VmRSS:'):
+                        rss[pid] = int(linea.split()[1]) / 1024
+        except OSError:
+            pass
+    return rss
+
+
+class Registro:
+    """Acumula los resultados de todas las solicitudes de los usuarios simulados"""
+
+    def __init__(self):
+        self.candado = threading.Lock()
+        self.solicitudes = []
+
+    def agregar(self, escenario, endpoint, latencia, resultado, mensaje=None):
+        with self.candado:
+            self.solicitudes.append((escenario, endpoint, latencia, resultado, mensaje))
+
+
+def leer_stream(contenido):
+    """Revisa una respuesta NDJSON: correcta si termina con el evento 'fin' y no trae errores"""
+    eventos = [json.loads(linea) for linea in contenido.decode().splitlines() if linea.strip()]
+    for evento in eventos:
+        if evento.get('evento') == 'error':
+            return 'error', evento.get('message')
+    if not eventos or eventos[-1].get('evento') != 'fin':
+        return 'error', 'La respuesta terminó antes del evento fin'
+    return 'ok', None
+
+def enviar(url, cuerpo, cliente, timeout):
+    """Envía un POST JSON; devuelve ('ok' | 'rechazada' (429) | 'error', mensaje de error)"""
+    solicitud = urllib.request.Request(url, data=json.dumps(cuerpo).encode(), method='POST',
+                                       headers={'Content-Type': 'application/json',
+                                                'X-Forwarded-For': cliente})
+    try:
+        with urllib.request.urlopen(solicitud, timeout=timeout) as respuesta:
+            contenido = respuesta.read()
+        if url.endswith('/configurar'):
+            return 'ok', None
+        if url.endswith('_stream'):
+            return leer_stream(contenido)
+        respuesta = json.loads(contenido)
+        if respuesta.get('status') == 'success':
+            return 'ok', None
+        return 'error', respuesta.get('message')
+    except urllib.error.HTTPError as e:
+        return ('rechazada' if e.code == 429 else 'error'), f'HTTP {e.code}'
+    except (urllib.error.URLError, ConnectionError, socket.timeout, ValueError) as e:
+        return 'error', f'{type(e).__name__}: {e}'
+
+def usuario(indice, args, base, mezcla, cargas, registro, fin):
+    """Un usuario simulado: elige escenario y tamaño, envía y espera un tiempo de reflexión"""
+    rng = random.Random(args.semilla + indice)
+    cliente = f'10.0.{indice // 250}.{indice % 250 + 1}'
+    nombres = [nombre for nombre, _ in mezcla]
+    pesos = [peso for _, peso in mezcla]
+
+    while time.time() < fin:
+        escenario = rng.choices(nombres, weights=pesos)[0]
+        tamano = rng.choice(args.tamanos)
+        for endpoint, cuerpo in cargas[(escenario, tamano)]:
+            inicio = time.perf_counter()
+            resultado, mensaje = enviar(base + endpoint, cuerpo, cliente, args.timeout)
+            registro.agregar(escenario, endpoint, time.perf_counter() - inicio, resultado, mensaje)
+            if resultado != 'ok':
+                break
+        if args.pausa > 0:
+            time.sleep(rng.expovariate(1 / args.pausa))
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def resumir(solicitudes, duracion):
+    """Rendimiento, latencias y errores, en total y por endpoint"""
+    grupos = {'total': solicitudes}
+    for solicitud in solicitudes:
+        grupos.setdefault(solicitud[1], []).append(solicitud)
+
+    resumen = {}
+    for nombre, grupo in grupos.items():
+        latencias = sorted(latencia * 1000 for _, _, latencia, _, _ in grupo)
+        resultados = [resultado for _, _, _, resultado, _ in grupo]
+        resumen[nombre] = {
+            'solicitudes': len(grupo),
+            'por_segundo': round(len(grupo) / duracion, 2),
+            'p50_ms': percentil(latencias, 50),
+            'p95_ms': percentil(latencias, 95),
+            'p99_ms': percentil(latencias, 99),
+            'tasa_error': round(resultados.count('error') / len(grupo), 4) if grupo else 0,
+            'tasa_rechazo': round(resultados.count('rechazada') / len(grupo), 4) if grupo else 0
+        }
+    return resumen
+
+def contar_errores(solicitudes):
+    """Mensajes de error distintos por endpoint, del más frecuente al menos frecuente"""
+    errores = {}
+    for _, endpoint, _, resultado, mensaje in solicitudes:
+        if resultado == 'error':
+            clave = f'{endpoint}: {mensaje}'
+            errores[clave] = errores.get(clave, 0) + 1
+    return dict(sorted(errores.items(), key=lambda par: par[1], reverse=True))
+
+def imprimir(reporte):
+    print(f"\nConfiguración: {json.dumps(reporte['configuracion'])}")
+    print(f"{'endpoint':<22}{'solic.':>8}{'solic/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'error':>8}{'429':>8}")
+    for nombre, fila in reporte['resumen'].items():
+        valores = [f"{fila[k]:.0f}" if fila[k] is not None else '-' for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{nombre:<22}{fila['solicitudes']:>8}{fila['por_segundo']:>9}{valores[0]:>9}{valores[1]:>9}"
+              f"{valores[2]:>9}{fila['tasa_error']:>8.2%}{fila['tasa_rechazo']:>8.2%}")
+    if reporte['rss_mb']:
+        rss = reporte['rss_mb']
+        print(f"RSS por worker (MB): inicial {rss['inicial']}, máximo {rss['maximo']}, final {rss['final']}")
+    if reporte['errores']:
+        print('Errores:')
+        for mensaje, cantidad in reporte['errores'].items():
+            print(f'{cantidad:>8}  {mensaje}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Servidor ya iniciado; si se omite se levanta gunicorn localmente')
+    parser.add_argument('--workers', type=int, default=1, help='Workers de gunicorn (por omisión 1)')
+    parser.add_argument('--threads', type=int, default=1, help='Hilos por worker (por omisión 1)')
+    parser.add_argument('--timeout', type=int, default=120, help='Timeout de gunicorn y de cada solicitud (s)')
+    parser.add_argument('--gunicorn-extra', nargs=argparse.REMAINDER, default=[],
+                        help='Argumentos adicionales para gunicorn (van al final)')
+    parser.add_argument('--usuarios', type=int, default=4, help='Usuarios concurrentes')
+    parser.add_argument('--duracion', type=float, default=30, help='Duración de la prueba (s)')
+    parser.add_argument('--pausa', type=float, default=1.0, help='Tiempo medio de reflexión entre solicitudes (s)')
+    parser.add_argument('--mezcla', default='desagrupado:4,stream:1,ponderado:2,agrupado:2,tabla:1,agrupar:1,ventanas:1',
+                        help='Escenarios y pesos, ej. "desagrupado:5,agrupado:2"')
+    parser.add_argument('--tamanos', default='100,1000,10000', help='Tamaños de datos, separados por comas')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--con-almacen', action='store_true',
+                        help='Mantener el almacén SQLite activo (las repeticiones se leen de caché)')
+    parser.add_argument('--json', help='Guardar el reporte en este archivo')
+    args = parser.parse_args()
+    args.tamanos = [int(t) for t in args.tamanos.split(',')]
+    mezcla = leer_mezcla(args.mezcla)
+
+    # Las cargas se generan antes de empezar para no medir el costo de armarlas
+    rng = random.Random(args.semilla)
+    cargas = {(nombre, tamano): ESCENARIOS[nombre](rng, tamano) for nombre, _ in mezcla for tamano in args.tamanos}
+
+    proceso = None
+    if args.url:
+        base = args.url.rstrip('/')
+    else:
+        puerto = puerto_libre()
+        proceso = iniciar_gunicorn(args, puerto)
+        base = f'http://127.0.0.1:{puerto}'
+
+    try:
+        registro = Registro()
+        muestras_rss = []
+        if proceso:
+            muestras_rss.append(rss_workers(proceso.pid))
+
+        inicio = time.time()
+        fin = inicio + args.duracion
+        hilos = [threading.Thread(target=usuario, args=(i, args, base, mezcla, cargas, registro, fin), daemon=True)
+                 for i in range(args.usuarios)]
+        for hilo in hilos:
+            hilo.start()
+        while any(hilo.is_alive() for hilo in hilos):
+            time.sleep(1)
+            if proceso:
+                muestras_rss.append(rss_workers(proceso.pid))
+        duracion = time.time() - inicio
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
+
+    rss = None
+    if muestras_rss and any(muestras_rss):
+        todas = [valor for muestra in muestras_rss for valor in muestra.values()]
+        rss = {
+            'inicial': round(max(muestras_rss[0].values(), default=0), 1),
+            'maximo': round(max(todas), 1),
+            'final': round(max(muestras_rss[-1].values(), default=0), 1)
+        }
+
+    reporte = {
+        'configuracion': {
+            # Con --url no se conoce la configuración del servidor
+            'url': args.url,
+            'workers': None if args.url else args.workers,
+            'threads': None if args.url else args.threads,
+            'usuarios': args.usuarios, 'duracion': args.duracion, 'pausa': args.pausa,
+            'mezcla': args.mezcla, 'tamanos': args.tamanos
+        },
+        'duracion_real': round(duracion, 2),
+        'resumen': resumir(registro.solicitudes, duracion),
+        'errores': contar_errores(registro.solicitudes),
+        'rss_mb': rss
+    }
+    imprimir(reporte)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Las pruebas no deben escribir en la base de análisis
+os.environ['ALMACEN_RUTA'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as aplicacion  # noqa: E402
+
+
+@pytest.fixture
+def analizador():
+    return aplicacion.AnalisisEstadistico()
+
+
+@pytest.fixture
+def cliente():
+    return aplicacion.app.test_client()
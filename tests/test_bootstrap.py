@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import app as aplicacion
+
+
+def test_bootstrap_con_conteos_no_pierde_precision_con_valores_grandes(analizador):
+    valores = 1e8 + np.arange(5.0)
+    conteos = np.array([10, 20, 30, 20, 10])
+
+    agrupado = analizador.calcular_intervalos_bootstrap(valores, conteos, remuestras=20000, semilla=1)
+    expandido = analizador.calcular_intervalos_bootstrap(np.repeat(valores, conteos), remuestras=20000, semilla=1)
+
+    for limite in ('inferior', 'superior'):
+        assert agrupado['intervalos']['varianza'][limite] == pytest.approx(
+            expandido['intervalos']['varianza'][limite], abs=0.05)
+    assert agrupado['intervalos']['varianza']['inferior'] > 0.9
+
+
+@pytest.mark.parametrize('remuestras', [7_000_000, 70_000_000])
+def test_remuestras_fuera_del_limite_se_rechazan(cliente, remuestras):
+    respuesta = cliente.post('/procesar_bootstrap', json={'datos': [1, 2], 'remuestras': remuestras}).get_json()
+    assert respuesta['status'] == 'error'
+    assert 'remuestras' in respuesta['message']
+
+
+def test_costo_incluye_un_termino_fijo_por_remuestra():
+    control = aplicacion.ControlAdmision(presupuesto=5000, max_por_cliente=1, espera_max=0)
+    # Con dos datos, un millón de remuestras tarda cientos de ms aunque el costo por dato sea mínimo
+    assert control.estimar_costo(2, 0, 0, remuestras=1_000_000) >= 300
+    plan = control.planificar(2, 0, 0, remuestras=50_000_000)
+    assert plan['decision'] == 'degradada'
+    assert plan['opciones']['remuestras'] * control.costo_remuestra(2) <= 5000
+
+
+def test_estadisticos_se_escriben_sin_apilar_bloques(analizador, monkeypatch):
+    monkeypatch.setattr(analizador, 'bootstrap_max_bytes', 1000)
+    monkeypatch.setattr(np, 'vstack', None)
+    datos = [1.0, 4.0, 2.0, 8.0, 5.0]
+    por_bloques = analizador.calcular_intervalos_bootstrap(datos, remuestras=999, semilla=3)
+    assert por_bloques['bloques'] > 1
+    assert por_bloques['intervalos']['media']['inferior'] < 4 < por_bloques['intervalos']['media']['superior']
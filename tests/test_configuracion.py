@@ -0,0 +1,33 @@
+import pytest
+
+import app as aplicacion
+
+
+@pytest.fixture(autouse=True)
+def configuracion_global():
+    # Simula un worker que recibió /configurar con la configuración contraria
+    aplicacion.analizador.es_muestral = False
+    yield
+    aplicacion.analizador.es_muestral = True
+
+
+@pytest.mark.parametrize('ruta, cuerpo, extraer', [
+    ('/procesar_ventanas', {'datos': [1, 2, 3, 4], 'ventana': 2}, lambda r: r['varianza'][0]),
+    ('/procesar_tabla', {'tabla': {'a': [1, 2]}}, lambda r: r['estadisticas']['varianza'][0]),
+    ('/procesar_datos', {'datos': [1, 2]}, lambda r: r['estadisticas']['varianza']),
+])
+def test_rutas_usan_es_muestral_del_cuerpo(cliente, ruta, cuerpo, extraer):
+    resultado = cliente.post(ruta, json={**cuerpo, 'es_muestral': True}).get_json()['resultado']
+    assert extraer(resultado) == pytest.approx(0.5)
+
+
+def test_bootstrap_con_hilos_usa_es_muestral_del_cuerpo(cliente, monkeypatch):
+    monkeypatch.setattr(aplicacion.analizador, 'bootstrap_hilos', 4)
+    monkeypatch.setattr(aplicacion.analizador, 'bootstrap_max_bytes', 1000)
+    cuerpo = {'datos': [1.0, 2.0], 'remuestras': 400, 'semilla': 1}
+    muestral = cliente.post('/procesar_bootstrap', json={**cuerpo, 'es_muestral': True}).get_json()['resultado']
+    poblacional = cliente.post('/procesar_bootstrap', json={**cuerpo, 'es_muestral': False}).get_json()['resultado']
+    assert muestral['bloques'] > 1
+    # Con dos datos, la varianza muestral de cada remuestra es el doble de la poblacional
+    assert muestral['intervalos']['varianza']['superior'] == pytest.approx(
+        2 * poblacional['intervalos']['varianza']['superior'])
@@ -0,0 +1,58 @@
+import os
+import threading
+
+import pytest
+
+import app as aplicacion
+
+
+@pytest.fixture
+def perfilado(tmp_path, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'PERFIL_TOKEN', 'secreto')
+    monkeypatch.setattr(aplicacion, 'PERFIL_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_retencion_de_perfiles(cliente, perfilado, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'PERFIL_MAX_ARCHIVOS', 3)
+    for i in range(5):
+        respuesta = cliente.post('/procesar_atipicos?perfilar=secreto', json={'datos': [1, 2, 3, i]})
+        assert respuesta.get_json()['status'] == 'success'
+    assert len(os.listdir(perfilado)) == 2 * 3
+
+
+def test_solicitudes_simultaneas_no_fallan(cliente, perfilado):
+    # Mientras una solicitud se perfila, la otra se atiende sin perfilar
+    aplicacion.candado_perfil.acquire()
+    try:
+        respuesta = cliente.post('/procesar_atipicos?perfilar=secreto', json={'datos': [1, 2, 3]})
+    finally:
+        aplicacion.candado_perfil.release()
+    assert respuesta.get_json()['status'] == 'success'
+    assert os.listdir(perfilado) == []
+
+
+def test_perfilador_ya_activo(cliente, perfilado, monkeypatch):
+    def ocupado(self):
+        raise ValueError('Another profiling tool is already active')
+    monkeypatch.setattr(aplicacion.cProfile.Profile, 'enable', ocupado)
+    respuesta = cliente.post('/procesar_atipicos?perfilar=secreto', json={'datos': [1, 2, 3]})
+    assert respuesta.get_json()['status'] == 'success'
+    assert not aplicacion.candado_perfil.locked()
+
+
+def test_hilos_concurrentes(perfilado):
+    estados = []
+
+    def enviar():
+        with aplicacion.app.test_client() as cliente:
+            respuesta = cliente.post('/procesar_ventanas?perfilar=secreto',
+                                     json={'datos': list(range(20000)), 'ventana': 50})
+            estados.append(respuesta.status_code)
+
+    hilos = [threading.Thread(target=enviar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert estados == [200] * 4
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('es_muestral', [True, False])
+def test_ponderados_igual_que_datos_expandidos(analizador, es_muestral):
+    analizador.es_muestral = es_muestral
+    rng = np.random.default_rng(0)
+    valores = np.round(rng.normal(1e6, 3, 200), 1)
+    conteos = rng.integers(0, 50, 200)
+
+    unicos, conteos_unicos = analizador._preparar_ponderados(valores, conteos)
+    ponderadas = analizador.calcular_estadisticas_ponderadas(unicos, conteos_unicos)
+    expandidas = analizador.calcular_estadisticas_basicas(np.repeat(valores, conteos))
+
+    for clave in ('media', 'mediana', 'varianza', 'desviacion_estandar', 'valor_minimo', 'valor_maximo'):
+        assert ponderadas[clave] == pytest.approx(expandidas[clave], rel=1e-9, abs=1e-4)
+
+
+def test_cuantil_ponderado_igual_que_percentile(analizador):
+    valores = np.array([1.0, 2.5, 4.0, 10.0])
+    conteos = np.array([3, 1, 4, 2])
+    q = np.linspace(0, 1, 21)
+    esperado = np.percentile(np.repeat(valores, conteos), 100 * q)
+    assert np.allclose(analizador._cuantil_ponderado(valores, conteos, q), esperado)
+
+
+@pytest.mark.parametrize('conteos', [[2.5, 1], [float('nan'), 1], [-1, 2]])
+def test_conteos_invalidos(analizador, conteos):
+    with pytest.raises(ValueError):
+        analizador._preparar_ponderados([1, 2], conteos)
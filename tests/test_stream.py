@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+
+def leer_eventos(respuesta):
+    # json.loads rechaza NaN con parse_constant, igual que JSON.parse en el navegador
+    def rechazar(constante):
+        raise ValueError(f'Valor no válido en JSON: {constante}')
+    return [json.loads(linea, parse_constant=rechazar) for linea in respuesta.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'es_agrupado': True, 'clases': ['10-20', '20-30'], 'frecuencias': [0, 5]},
+    {'es_agrupado': False, 'es_muestral': True, 'datos': [7]},
+])
+def test_stream_sin_nan(cliente, cuerpo):
+    eventos = leer_eventos(cliente.post('/procesar_datos_stream', json=cuerpo))
+    assert eventos[-1]['evento'] == 'fin'
+
+
+@pytest.mark.parametrize('cuerpo', [{'datos': [1, 2], 'tam_pagina': 'a'}, [1, 2, 3]])
+def test_stream_cuerpo_invalido(cliente, cuerpo):
+    respuesta = cliente.post('/procesar_datos_stream', json=cuerpo)
+    assert respuesta.mimetype == 'application/x-ndjson'
+    assert leer_eventos(respuesta)[-1]['evento'] == 'error'
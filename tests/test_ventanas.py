@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def referencia(datos, ventana, paso, ddof, cada=1):
+    # cada > 1 compara sólo una de cada `cada` ventanas, para no materializarlas todas
+    ventanas = sliding_window_view(datos, ventana)[::paso][::cada]
+    return ventanas.mean(axis=1), ventanas.var(axis=1, ddof=ddof), ventanas.min(axis=1), ventanas.max(axis=1)
+
+
+@pytest.mark.parametrize('ventana, paso', [(10, 1), (10, 10), (7, 3), (5000, 1)])
+@pytest.mark.parametrize('es_muestral', [True, False])
+def test_ventanas_igual_que_calculo_directo_con_tendencia(analizador, ventana, paso, es_muestral):
+    # Lecturas con tendencia: la deriva es enorme comparada con el ruido dentro de cada ventana
+    analizador.es_muestral = es_muestral
+    rng = np.random.default_rng(0)
+    datos = 0.1 * np.arange(200_000) + rng.normal(0, 0.01, 200_000)
+
+    resultado = analizador.calcular_estadisticas_moviles(datos, ventana, paso)
+    resultado = {clave: resultado[clave][::97] for clave in ('media', 'varianza', 'minimo', 'maximo')}
+    media, varianza, minimo, maximo = referencia(datos, ventana, paso, 1 if es_muestral else 0, cada=97)
+
+    assert np.allclose(resultado['media'], np.round(media, 4), rtol=0, atol=2e-4)
+    assert np.allclose(resultado['varianza'], np.round(varianza, 4), rtol=1e-3, atol=2e-4)
+    assert resultado['minimo'] == np.round(minimo, 4).tolist()
+    assert resultado['maximo'] == np.round(maximo, 4).tolist()
+
+
+def test_varianza_relativa_con_tendencia_sin_redondeo(analizador):
+    rng = np.random.default_rng(1)
+    datos = 0.1 * np.arange(1_000_000) + rng.normal(0, 0.01, 1_000_000)
+    analizador._redondear_columna = lambda valores: np.asarray(valores, dtype=float)
+
+    varianza = analizador.calcular_estadisticas_moviles(datos, 10)['varianza']
+    esperada = sliding_window_view(datos, 10).var(axis=1, ddof=1)
+    assert np.max(np.abs(varianza - esperada) / esperada) < 1e-6